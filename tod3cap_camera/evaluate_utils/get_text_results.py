@@ -3,6 +3,7 @@
 
 import argparse
 import json
+import multiprocessing
 import os
 import random
 import time
@@ -55,7 +56,11 @@ class DetectionEval:
                  result_path: str,
                  eval_set: str,
                  output_dir: str = None,
-                 verbose: bool = True):
+                 verbose: bool = True,
+                 gt_cache_dir: str = None,
+                 gt_boxes: EvalBoxes = None,
+                 all_gt_caption: Dict[str, Any] = None,
+                 num_workers: int = 0):
         """
         Initialize a DetectionEval object.
         :param nusc: A NuScenes object.
@@ -64,6 +69,12 @@ class DetectionEval:
         :param eval_set: The dataset split to evaluate on, e.g. train, val or test.
         :param output_dir: Folder to save plots and results to.
         :param verbose: Whether to print to stdout.
+        :param gt_cache_dir: Directory of the cached ground truth boxes, None loads them from the DB.
+        :param gt_boxes: GT boxes already loaded and filtered by `load_filtered_gt`, shared by the evaluations of
+            several result files. None loads them.
+        :param all_gt_caption: Caption annotations keyed by box token, None loads them.
+        :param num_workers: Number of processes filtering and matching the boxes, split by sample. 0 runs in this
+            process.
         """
         self.nusc = nusc
         self.result_path = result_path
@@ -71,6 +82,7 @@ class DetectionEval:
         self.output_dir = output_dir
         self.verbose = verbose
         self.cfg = config
+        self.num_workers = num_workers
 
         # Check result file exists.
         assert os.path.exists(result_path), 'Error: The result file does not exist!'
@@ -87,27 +99,25 @@ class DetectionEval:
             print('Initializing nuScenes detection evaluation')
         self.pred_boxes, self.meta = load_prediction(self.result_path, self.cfg.max_boxes_per_sample, DenseCaptionBox,
                                                      verbose=verbose)
-        self.gt_boxes = load_gt(self.nusc, self.eval_set, DenseCaptionBox, verbose=verbose)
 
         # assert set(self.pred_boxes.sample_tokens) == set(self.gt_boxes.sample_tokens), \
         #     "Samples in split doesn't match samples in predictions."
 
-        # Add center distances.
-        self.pred_boxes = add_center_dist(nusc, self.pred_boxes)
-        self.gt_boxes = add_center_dist(nusc, self.gt_boxes)
-
-        # Filter boxes (distance, points per box, etc.).
+        # Add center distances and filter boxes (distance, points per box, etc.).
         if verbose:
             print('Filtering predictions')
-        self.pred_boxes = filter_eval_boxes(nusc, self.pred_boxes, self.cfg.class_range, verbose=verbose)
-        if verbose:
-            print('Filtering ground truth annotations')
-        self.gt_boxes = filter_eval_boxes(nusc, self.gt_boxes, self.cfg.class_range, verbose=verbose)
+        self.pred_boxes = add_center_dist_and_filter(nusc, self.pred_boxes, self.cfg.class_range, num_workers)
+        if gt_boxes is None:
+            gt_boxes = load_filtered_gt(nusc, self.eval_set, self.cfg, verbose=verbose, gt_cache_dir=gt_cache_dir,
+                                        num_workers=num_workers)
+        self.gt_boxes = gt_boxes
 
         self.sample_tokens = self.gt_boxes.sample_tokens
 
-        with open("data/nuscenes/final_caption_bbox_token.json", "r") as f:
-            self.all_gt_caption = json.load(f)
+        if all_gt_caption is None:
+            with open("data/nuscenes/final_caption_bbox_token.json", "r") as f:
+                all_gt_caption = json.load(f)
+        self.all_gt_caption = all_gt_caption
 
     def main(self,
              plot_examples: int = 0,
@@ -119,112 +129,81 @@ class DetectionEval:
         :return: A dict that stores the high-level metrics and meta data.
         """
 
-        sample_tokens = self.pred_boxes.boxes.keys()
-        
+        # the matching is split by sample over the workers, the records are merged in sample order
+        sample_tokens = list(self.pred_boxes.boxes.keys())
         records = []
-        for sample_token in tqdm(sample_tokens):
-            pred_box_one_sample = self.pred_boxes.boxes[sample_token]
-            gt_box_one_sample = self.gt_boxes.boxes[sample_token]
-        
-            for pred_object_box in pred_box_one_sample:
-                all_ious = []
-                all_captions = []
-                if len(gt_box_one_sample) == 0:
-                    continue
-                for gt_object_box in gt_box_one_sample:
-                    iou = scale_iou(gt_object_box, pred_object_box)
-                    all_ious.append(iou)
-                max_iou = max(all_ious)
-                
-                bbox_token = gt_box_one_sample[all_ious.index(max_iou)].box_token
-                if bbox_token in self.all_gt_caption:
-                    reference_all_data = self.all_gt_caption[bbox_token]
-                    reference = reference_all_data['final_caption']
-                    # reference = reference_all_data['attribute_caption']['attribute_caption'] + \
-                    #         " about " + str(round(reference_all_data['depth_caption']['depth']))+" meters away" + \
-                    #         " " + reference_all_data['localization_caption']['localization_caption'] + \
-                    #         " is " + reference_all_data['motion_caption']['motion_caption'] + \
-                    #         " " + reference_all_data['map_caption']['map_caption']
-                else:
-                    reference = "The object is ignored."
-                record = {
-                    'sample_token': sample_token,
-                    'gt_object_box': str(gt_object_box),
-                    'pred_object_box': str(pred_object_box),
-                    'iou': max_iou,
-                    'candidate': pred_object_box.caption,
-                    'references': [reference],
-                }
-                # print(record)
-                records.append(record)
-            # break
-        
-        # iou_threshold = 0.25
-        
-        scores_1 = self.score_captions_by_4_indicators(records, iou_threshold=0.25)
-
-        # iou_threshold = 0.5
-
-        scores_2 = self.score_captions_by_4_indicators(records, iou_threshold=0.5)
-
-        # print(scores)
-        
-        scores = {
-            "iou_0.25": scores_1,
-            "iou_0.5": scores_2,
-        }
+        for shard_records in run_sharded(_match_shard, sample_tokens, self.num_workers,
+                                         pred_boxes=self.pred_boxes, gt_boxes=self.gt_boxes,
+                                         all_gt_caption=self.all_gt_caption):
+            records.extend(shard_records)
+
+        scores = self.score_captions(records, iou_thresholds=(0.25, 0.5))
         print(scores)
         return records, scores
 
-    def score_captions_by_4_indicators(self, raw_records, iou_threshold=0.):
-        
-        filtered_records = []
-        for record in raw_records:
-            if record['iou'] > iou_threshold:
-                filtered_records.append(record)
-        
-        records = filtered_records
-        
-        references = {}
-        candidates = {}
-        for i, record in enumerate(records):
-            references[i] = [' '.join(token for token in ref.split() if token not in [",", "."])
-                                for ref in record['references']]
-            candidates[i] = [' '.join(token for token in record['candidate'].split()
-                                if token not in [",", "."])]
-
-        if len(references) == 0 or len(candidates) == 0:
-            return 0., [0. for _ in range(len(records))]
-        
-        scores={}
-        
-        # mean_meteor
-        meteor_scorer = Meteor()
-        mean_meteor, _ = meteor_scorer.compute_score(references, candidates)
-        scores['meteor']=mean_meteor
-        meteor_scorer.close()
-
-        # bleu
-        bleu_scorer=Bleu()
-        bleu_4_score,_=bleu_scorer.compute_score(references,candidates)
-        for i in range(4):
-            scores["bleu{}".format(i+1)]=bleu_4_score[i]
-
-        # mean_cide
-        cider_scorer=Cider()
-        mean_cider,_=cider_scorer.compute_score(references,candidates)
-        scores['cider']=mean_cider
-
-        # mean_rouge
-        rouge_scorer=Rouge()
-        mean_rouge,_=rouge_scorer.compute_score(references,candidates)
-        scores['rouge']=mean_rouge
-
-        for key in scores.keys():
-            scores[key]*=len(records)/len(raw_records)
-
-        return scores
+    def score_captions(self, raw_records, iou_thresholds=(0.25, 0.5)):
+        """
+        Score the captions of `raw_records` at every IoU threshold in one pass.
+        The captions are cleaned once, ROUGE (a mean of per-record scores) is computed once for the records above the
+        lowest threshold and averaged per threshold, and a single METEOR process is shared by all thresholds.
+        METEOR, BLEU and CIDEr are corpus-level (fragmentation, brevity penalty and document frequencies depend on the
+        scored set), so they are still computed on the records of each threshold to keep the reported numbers.
+        :param raw_records: Records built by `main`.
+        :param iou_thresholds: IoU thresholds, a record is scored at a threshold if its IoU is strictly above it.
+        :return: {'iou_<threshold>': scores}.
+        """
+        min_threshold = min(iou_thresholds)
+        records = [record for record in raw_records if record['iou'] > min_threshold]
+        ious = np.array([record['iou'] for record in records])
+        references = [[' '.join(token for token in ref.split() if token not in [",", "."])
+                       for ref in record['references']] for record in records]
+        candidates = [[' '.join(token for token in record['candidate'].split()
+                       if token not in [",", "."])] for record in records]
+
+        rouge_per_record = None
+        if len(records) > 0:
+            _, rouge_per_record = Rouge().compute_score(dict(enumerate(references)), dict(enumerate(candidates)))
+            rouge_per_record = np.asarray(rouge_per_record)
+
+        all_scores = {}
+        meteor_scorer = Meteor() if len(records) > 0 else None
+        try:
+            for iou_threshold in iou_thresholds:
+                keep = np.flatnonzero(ious > iou_threshold)
+                subset_references = {i: references[k] for i, k in enumerate(keep)}
+                subset_candidates = {i: candidates[k] for i, k in enumerate(keep)}
+                if len(keep) == 0:
+                    all_scores["iou_{}".format(iou_threshold)] = (0., [])
+                    continue
 
+                scores = {}
+                # mean_meteor
+                mean_meteor, _ = meteor_scorer.compute_score(subset_references, subset_candidates)
+                scores['meteor'] = mean_meteor
+
+                # bleu
+                bleu_4_score, _ = Bleu().compute_score(subset_references, subset_candidates)
+                for i in range(4):
+                    scores["bleu{}".format(i+1)] = bleu_4_score[i]
+
+                # mean_cide
+                mean_cider, _ = Cider().compute_score(subset_references, subset_candidates)
+                scores['cider'] = mean_cider
+
+                # mean_rouge
+                scores['rouge'] = float(rouge_per_record[keep].mean())
+
+                for key in scores.keys():
+                    scores[key] *= len(keep)/len(raw_records)
+                all_scores["iou_{}".format(iou_threshold)] = scores
+        finally:
+            if meteor_scorer is not None:
+                meteor_scorer.close()
+
+        return all_scores
+
+    def score_captions_by_4_indicators(self, raw_records, iou_threshold=0.):
+        return self.score_captions(raw_records, iou_thresholds=(iou_threshold, ))["iou_{}".format(iou_threshold)]
 
 
 def scale_iou(sample_annotation: EvalBox, sample_result: EvalBox) -> float:
@@ -253,6 +232,151 @@ def scale_iou(sample_annotation: EvalBox, sample_result: EvalBox) -> float:
     return iou
 
 
+def pairwise_scale_iou(sample_annotations: list, sample_results: list) -> np.ndarray:
+    """
+    Vectorized `scale_iou` between every prediction and every GT box of a sample.
+    :param sample_annotations: GT annotation samples.
+    :param sample_results: Predicted samples.
+    :return: (len(sample_results), len(sample_annotations)) scale IOUs.
+    """
+    sa_size = np.array([box.size for box in sample_annotations], dtype=np.float64).reshape(-1, 3)
+    sr_size = np.array([box.size for box in sample_results], dtype=np.float64).reshape(-1, 3)
+    assert np.all(sa_size > 0), 'Error: sample_annotation sizes must be >0.'
+    assert np.all(sr_size > 0), 'Error: sample_result sizes must be >0.'
+
+    intersection = np.prod(np.minimum(sr_size[:, None], sa_size[None]), axis=-1)
+    union = np.prod(sr_size, axis=-1)[:, None] + np.prod(sa_size, axis=-1)[None] - intersection
+    return intersection / union
+
+
+def match_records(sample_token: str, pred_boxes: EvalBoxes, gt_boxes: EvalBoxes, all_gt_caption: Dict[str, Any]) \
+        -> list:
+    """
+    Caption records of the predictions of a sample, each matched to the GT box of highest scale IoU.
+    :param sample_token: Token of the sample.
+    :param pred_boxes: Predicted boxes.
+    :param gt_boxes: GT boxes.
+    :param all_gt_caption: Caption annotations keyed by box token.
+    :return: The records of the captioned predictions.
+    """
+    pred_box_one_sample = pred_boxes.boxes[sample_token]
+    gt_box_one_sample = gt_boxes.boxes[sample_token]
+    if len(pred_box_one_sample) == 0 or len(gt_box_one_sample) == 0:
+        return []
+
+    # (num_pred, num_gt) scale IoU of all pairs of the sample
+    ious = pairwise_scale_iou(gt_box_one_sample, pred_box_one_sample)
+    matched_gt_inds = ious.argmax(axis=1)
+    max_ious = ious[np.arange(len(pred_box_one_sample)), matched_gt_inds]
+
+    records = []
+    for pred_object_box, gt_ind, max_iou in zip(pred_box_one_sample, matched_gt_inds, max_ious):
+        # boxes beyond the caption budget of the detector are not captioned
+        if pred_object_box.caption is None:
+            continue
+        gt_object_box = gt_box_one_sample[gt_ind]
+        bbox_token = gt_object_box.box_token
+        if bbox_token in all_gt_caption:
+            reference_all_data = all_gt_caption[bbox_token]
+            reference = reference_all_data['final_caption']
+            # reference = reference_all_data['attribute_caption']['attribute_caption'] + \
+            #         " about " + str(round(reference_all_data['depth_caption']['depth']))+" meters away" + \
+            #         " " + reference_all_data['localization_caption']['localization_caption'] + \
+            #         " is " + reference_all_data['motion_caption']['motion_caption'] + \
+            #         " " + reference_all_data['map_caption']['map_caption']
+        else:
+            reference = "The object is ignored."
+        records.append({
+            'sample_token': sample_token,
+            'gt_object_box': str(gt_object_box),
+            'pred_object_box': str(pred_object_box),
+            'iou': float(max_iou),
+            'candidate': pred_object_box.caption,
+            'references': [reference],
+        })
+    return records
+
+
+# State of the forked evaluation workers, set by `run_sharded` before the pool is created so that the workers inherit
+# the NuScenes database and the boxes instead of receiving them pickled.
+_shard_state = {}
+
+
+def run_sharded(fn, sample_tokens: list, num_workers: int, **state) -> list:
+    """
+    Runs fn(sample_tokens_chunk) on contiguous chunks of `sample_tokens` in `num_workers` forked processes.
+    :param fn: Module level function reading its inputs from `_shard_state`.
+    :param sample_tokens: Sample tokens to split.
+    :param num_workers: Number of processes, 0 or 1 runs fn on all the tokens in this process.
+    :param state: Inputs of fn, shared with the workers.
+    :return: The results of the chunks, in order.
+    """
+    _shard_state.update(state)
+    try:
+        num_chunks = min(num_workers, len(sample_tokens))
+        if num_chunks <= 1:
+            return [fn(sample_tokens)]
+        chunk_size = (len(sample_tokens) + num_chunks - 1) // num_chunks
+        chunks = [sample_tokens[i:i + chunk_size] for i in range(0, len(sample_tokens), chunk_size)]
+        with multiprocessing.get_context('fork').Pool(num_chunks) as pool:
+            return pool.map(fn, chunks)
+    finally:
+        _shard_state.clear()
+
+
+def _filter_shard(sample_tokens: list) -> Dict[str, list]:
+    boxes = EvalBoxes()
+    for sample_token in sample_tokens:
+        boxes.add_boxes(sample_token, _shard_state['boxes'].boxes[sample_token])
+    boxes = add_center_dist(_shard_state['nusc'], boxes)
+    boxes = filter_eval_boxes(_shard_state['nusc'], boxes, _shard_state['class_range'], verbose=False)
+    return boxes.boxes
+
+
+def _match_shard(sample_tokens: list) -> list:
+    records = []
+    for sample_token in sample_tokens:
+        records.extend(match_records(sample_token, _shard_state['pred_boxes'], _shard_state['gt_boxes'],
+                                     _shard_state['all_gt_caption']))
+    return records
+
+
+def add_center_dist_and_filter(nusc: NuScenes, eval_boxes: EvalBoxes, class_range: Dict[str, float],
+                               num_workers: int = 0) -> EvalBoxes:
+    """
+    `add_center_dist` and `filter_eval_boxes` of the boxes, split by sample over `num_workers` processes.
+    :param nusc: A NuScenes instance.
+    :param eval_boxes: Boxes to filter.
+    :param class_range: Maps the detection name to the eval distance threshold for that class.
+    :param num_workers: Number of processes, 0 runs in this process.
+    :return: The filtered boxes.
+    """
+    filtered_boxes = EvalBoxes()
+    for shard_boxes in run_sharded(_filter_shard, eval_boxes.sample_tokens, num_workers, nusc=nusc, boxes=eval_boxes,
+                                   class_range=class_range):
+        for sample_token, boxes in shard_boxes.items():
+            filtered_boxes.add_boxes(sample_token, boxes)
+    return filtered_boxes
+
+
+def load_filtered_gt(nusc: NuScenes, eval_set: str, config: DetectionConfig, verbose: bool = False,
+                     gt_cache_dir: str = None, num_workers: int = 0) -> EvalBoxes:
+    """
+    Loads the GT boxes of the split, with center distances and filtered like the predictions.
+    :param nusc: A NuScenes instance.
+    :param eval_set: The dataset split to evaluate on.
+    :param config: A DetectionConfig object.
+    :param verbose: Whether to print to stdout.
+    :param gt_cache_dir: Directory of the cached ground truth boxes, None loads them from the DB.
+    :param num_workers: Number of processes filtering the boxes, 0 runs in this process.
+    :return: The GT boxes.
+    """
+    gt_boxes = load_gt(nusc, eval_set, DenseCaptionBox, verbose=verbose, cache_dir=gt_cache_dir)
+    if verbose:
+        print('Filtering ground truth annotations')
+    return add_center_dist_and_filter(nusc, gt_boxes, config.class_range, num_workers)
+
+
 class NuScenesEval(DetectionEval):
     """
     Dummy class for backward-compatibility. Same as DetectionEval.
@@ -264,7 +388,9 @@ if __name__ == "__main__":
     # Settings.
     parser = argparse.ArgumentParser(description='Evaluate nuScenes detection results.',
                                      formatter_class=argparse.ArgumentDefaultsHelpFormatter)
-    parser.add_argument('--result_path', type=str, default='test/bevformer_tiny_test/Fri_Nov__1_04_03_23_2024/pts_bbox/results_nusc_formatted.json', help='The submission as a JSON file.')
+    parser.add_argument('--result_path', type=str, nargs='+',
+                        default=['test/bevformer_tiny_test/Fri_Nov__1_04_03_23_2024/pts_bbox/results_nusc_formatted.json'],
+                        help='The submissions as JSON files, evaluated one after the other against the same GT.')
     parser.add_argument('--output_dir', type=str, default='~/nuscenes-metrics',
                         help='Folder to store result metrics, graphs and example visualizations.')
     parser.add_argument('--eval_set', type=str, default='val',
@@ -282,9 +408,13 @@ if __name__ == "__main__":
                         help='Whether to render PR and TP curves to disk.')
     parser.add_argument('--verbose', type=int, default=1,
                         help='Whether to print to stdout.')
+    parser.add_argument('--gt_cache_dir', type=str, default=None,
+                        help='Directory of the cached ground truth boxes, e.g. data/nuscenes/gt_cache. By default '
+                             'they are loaded from the DB.')
+    parser.add_argument('--num_workers', type=int, default=min(32, os.cpu_count() or 1),
+                        help='Number of processes filtering and matching the boxes, 0 to run in one process.')
     args = parser.parse_args()
 
-    result_path_ = os.path.expanduser(args.result_path)
     output_dir_ = os.path.expanduser(args.output_dir)
     eval_set_ = args.eval_set
     dataroot_ = args.dataroot
@@ -301,11 +431,20 @@ if __name__ == "__main__":
             cfg_ = DetectionConfig.deserialize(json.load(_f))
 
     nusc_ = NuScenes(version=version_, verbose=verbose_, dataroot=dataroot_)
-    nusc_eval = DetectionEval(nusc_, config=cfg_, result_path=result_path_, eval_set=eval_set_,
-                              output_dir=output_dir_, verbose=verbose_)
-    records, scores = nusc_eval.main(plot_examples=plot_examples_, render_curves=render_curves_)
-    
-    with open(os.path.join(os.path.dirname(args.result_path), "caption_records.json"), "w") as f:
-        json.dump(records, f)
-    with open(os.path.join(os.path.dirname(args.result_path), "caption_scores.json"), "w") as f:
-        json.dump(scores, f)
+    # the GT boxes and captions are loaded once for all the result files
+    gt_boxes_ = load_filtered_gt(nusc_, eval_set_, cfg_, verbose=verbose_, gt_cache_dir=args.gt_cache_dir,
+                                 num_workers=args.num_workers)
+    with open("data/nuscenes/final_caption_bbox_token.json", "r") as f:
+        all_gt_caption_ = json.load(f)
+
+    for result_path in args.result_path:
+        result_path_ = os.path.expanduser(result_path)
+        nusc_eval = DetectionEval(nusc_, config=cfg_, result_path=result_path_, eval_set=eval_set_,
+                                  output_dir=output_dir_, verbose=verbose_, gt_boxes=gt_boxes_,
+                                  all_gt_caption=all_gt_caption_, num_workers=args.num_workers)
+        records, scores = nusc_eval.main(plot_examples=plot_examples_, render_curves=render_curves_)
+
+        with open(os.path.join(os.path.dirname(result_path), "caption_records.json"), "w") as f:
+            json.dump(records, f)
+        with open(os.path.join(os.path.dirname(result_path), "caption_scores.json"), "w") as f:
+            json.dump(scores, f)
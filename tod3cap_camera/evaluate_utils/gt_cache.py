@@ -0,0 +1,164 @@
+"""
+Cached ground truth boxes of a nuScenes split for the detection and caption evaluations.
+
+Walking every sample annotation of the split through `nusc.get` and `nusc.box_velocity` takes minutes; it is done once
+and the boxes are stored as NumPy arrays (token tables as unicode arrays, boxes of sample i in rows
+offsets[i]:offsets[i + 1]) in `<cache_dir>/gt_<version>_<split>.npz`. The cache records the size and modification time
+of the nuScenes tables it was built from and is rebuilt when they change.
+"""
+import json
+import os
+from typing import Any, Callable, Dict
+
+import numpy as np
+import tqdm
+
+from nuscenes import NuScenes
+from nuscenes.eval.common.data_classes import EvalBoxes
+from nuscenes.eval.detection.utils import category_to_detection_name
+from nuscenes.utils.splits import create_splits_scenes
+
+GT_CACHE_FORMAT = 2
+# Tables the cached boxes are derived from.
+GT_TABLES = ('scene', 'sample', 'sample_annotation', 'attribute', 'category', 'instance', 'visibility')
+
+
+def table_fingerprint(nusc: NuScenes) -> Dict[str, Any]:
+    """
+    Size and modification time of the tables the cached boxes are derived from.
+    :param nusc: A NuScenes instance.
+    :return: {table: [size, mtime]} of the tables found in the version directory.
+    """
+    fingerprint = {}
+    for table in GT_TABLES:
+        path = os.path.join(nusc.dataroot, nusc.version, table + '.json')
+        if os.path.exists(path):
+            stat = os.stat(path)
+            fingerprint[table] = [stat.st_size, int(stat.st_mtime)]
+    return fingerprint
+
+
+def gt_cache_path(cache_dir: str, version: str, eval_split: str) -> str:
+    return os.path.join(cache_dir, 'gt_{}_{}.npz'.format(version, eval_split))
+
+
+def export_gt(nusc: NuScenes, eval_split: str, path: str, verbose: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Walks the annotations of the split once and writes the boxes of the detection classes to `path`.
+    :param nusc: A NuScenes instance.
+    :param eval_split: The evaluation split.
+    :param path: Output .npz file.
+    :param verbose: Whether to print messages to stdout.
+    :return: The cached arrays.
+    """
+    attribute_map = {a['token']: a['name'] for a in nusc.attribute}
+    splits = create_splits_scenes()
+
+    # 1-based index of every sample of the split in its scene.
+    scene_index = {}
+    for scene in nusc.scene:
+        if scene['name'] not in splits[eval_split]:
+            continue
+        sample_token, index = scene['first_sample_token'], 1
+        while sample_token != '':
+            scene_index[sample_token] = index
+            sample_token = nusc.get('sample', sample_token)['next']
+            index += 1
+    # Samples in the order of the sample table, as `load_gt` adds them to the EvalBoxes.
+    sample_tokens = [sample['token'] for sample in nusc.sample if sample['token'] in scene_index]
+    sample_index = [scene_index[sample_token] for sample_token in sample_tokens]
+
+    columns = {key: [] for key in ('token', 'translation', 'size', 'rotation', 'velocity', 'num_pts',
+                                   'detection_name', 'attribute_name', 'visibility')}
+    offsets = [0]
+    for sample_token in tqdm.tqdm(sample_tokens, leave=verbose):
+        for sample_annotation_token in nusc.get('sample', sample_token)['anns']:
+            sample_annotation = nusc.get('sample_annotation', sample_annotation_token)
+            detection_name = category_to_detection_name(sample_annotation['category_name'])
+            if detection_name is None:
+                continue
+            attr_tokens = sample_annotation['attribute_tokens']
+            if len(attr_tokens) > 1:
+                raise Exception('Error: GT annotations must not have more than one attribute!')
+
+            columns['token'].append(sample_annotation_token)
+            columns['translation'].append(sample_annotation['translation'])
+            columns['size'].append(sample_annotation['size'])
+            columns['rotation'].append(sample_annotation['rotation'])
+            columns['velocity'].append(nusc.box_velocity(sample_annotation_token)[:2])
+            columns['num_pts'].append(sample_annotation['num_lidar_pts'] + sample_annotation['num_radar_pts'])
+            columns['detection_name'].append(detection_name)
+            columns['attribute_name'].append(attribute_map[attr_tokens[0]] if attr_tokens else '')
+            columns['visibility'].append(sample_annotation['visibility_token'])
+        offsets.append(len(columns['token']))
+
+    arrays = dict(
+        meta=np.array(json.dumps(dict(format=GT_CACHE_FORMAT, version=nusc.version, eval_split=eval_split,
+                                      tables=table_fingerprint(nusc)))),
+        sample_tokens=np.array(sample_tokens, dtype=str),
+        sample_index=np.array(sample_index, dtype=np.int64),
+        offsets=np.array(offsets, dtype=np.int64),
+        token=np.array(columns['token'], dtype=str),
+        translation=np.array(columns['translation'], dtype=np.float64).reshape(-1, 3),
+        size=np.array(columns['size'], dtype=np.float64).reshape(-1, 3),
+        rotation=np.array(columns['rotation'], dtype=np.float64).reshape(-1, 4),
+        velocity=np.array(columns['velocity'], dtype=np.float64).reshape(-1, 2),
+        num_pts=np.array(columns['num_pts'], dtype=np.int64),
+        detection_name=np.array(columns['detection_name'], dtype=str),
+        attribute_name=np.array(columns['attribute_name'], dtype=str),
+        visibility=np.array(columns['visibility'], dtype=str),
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # written aside and renamed, so that concurrent evaluations never read a partial file
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+    return arrays
+
+
+def load_gt_arrays(nusc: NuScenes, eval_split: str, cache_dir: str, verbose: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Cached boxes of the split, exported first if the cache is missing or older than the tables.
+    :param nusc: A NuScenes instance.
+    :param eval_split: The evaluation split.
+    :param cache_dir: Directory of the cache files.
+    :param verbose: Whether to print messages to stdout.
+    :return: The cached arrays.
+    """
+    path = gt_cache_path(cache_dir, nusc.version, eval_split)
+    if os.path.exists(path):
+        with np.load(path, allow_pickle=False) as data:
+            arrays = dict(data)
+        meta = json.loads(str(arrays['meta']))
+        if meta == dict(format=GT_CACHE_FORMAT, version=nusc.version, eval_split=eval_split,
+                        tables=table_fingerprint(nusc)):
+            if verbose:
+                print('Loaded cached ground truth annotations from {}'.format(path))
+            return arrays
+        if verbose:
+            print('Ground truth cache {} is stale, rebuilding it'.format(path))
+    return export_gt(nusc, eval_split, path, verbose=verbose)
+
+
+def gt_boxes_from_arrays(arrays: Dict[str, np.ndarray], make_box: Callable) -> EvalBoxes:
+    """
+    Builds the EvalBoxes of the cached arrays.
+    :param arrays: Arrays of `load_gt_arrays`.
+    :param make_box: Called as make_box(sample_token, sample_index, row) for every box, `row` being a dict of the
+        cached fields of the box, returns the box.
+    :return: The GT boxes.
+    """
+    keys = ('token', 'translation', 'size', 'rotation', 'velocity', 'num_pts', 'detection_name', 'attribute_name',
+            'visibility')
+    columns = {key: arrays[key].tolist() for key in keys}
+    offsets = arrays['offsets'].tolist()
+
+    all_annotations = EvalBoxes()
+    for s, (sample_token, sample_index) in enumerate(zip(arrays['sample_tokens'].tolist(),
+                                                         arrays['sample_index'].tolist())):
+        sample_boxes = []
+        for i in range(offsets[s], offsets[s + 1]):
+            row = {key: columns[key][i] for key in keys}
+            sample_boxes.append(make_box(sample_token, sample_index, row))
+        all_annotations.add_boxes(sample_token, sample_boxes)
+    return all_annotations
@@ -18,6 +18,7 @@ from nuscenes.utils.geometry_utils import points_in_box
 from nuscenes.utils.splits import create_splits_scenes
 from nuscenes.eval.common.utils import center_distance
 from nuscenes.eval.detection.constants import DETECTION_NAMES, ATTRIBUTE_NAMES, TP_METRICS
+from evaluate_utils.gt_cache import gt_boxes_from_arrays, load_gt_arrays
 
 class DenseCaptionBox(DetectionBox):
     """ Data class used during detection evaluation. Can be a prediction or ground truth."""
@@ -134,13 +135,14 @@ def load_prediction(result_path: str, max_boxes_per_sample: int, box_cls, verbos
 
     return all_results, meta
 
-def load_gt(nusc: NuScenes, eval_split: str, box_cls, verbose: bool = False) -> EvalBoxes:
+def load_gt(nusc: NuScenes, eval_split: str, box_cls, verbose: bool = False, cache_dir: str = None) -> EvalBoxes:
     """
     Loads ground truth boxes from DB.
     :param nusc: A NuScenes instance.
     :param eval_split: The evaluation split for which we load GT boxes.
     :param box_cls: Type of box to load, e.g. DetectionBox or TrackingBox or DenseCaptionBox.
     :param verbose: Whether to print messages to stdout.
+    :param cache_dir: Directory of the ground truth cache (see gt_cache.py) used for DenseCaptionBox. None reads the DB.
     :return: The GT boxes.
     """
     # Init.
@@ -176,6 +178,25 @@ def load_gt(nusc: NuScenes, eval_split: str, box_cls, verbose: bool = False) ->
         assert len(nusc.sample_annotation) > 0, \
             'Error: You are trying to evaluate on the test set but you do not have the annotations!'
 
+    if cache_dir is not None and box_cls == DenseCaptionBox:
+        all_annotations = gt_boxes_from_arrays(
+            load_gt_arrays(nusc, eval_split, cache_dir, verbose=verbose),
+            lambda sample_token, sample_index, row: box_cls(
+                sample_token=sample_token,
+                translation=row['translation'],
+                size=row['size'],
+                rotation=row['rotation'],
+                velocity=row['velocity'],
+                num_pts=row['num_pts'],
+                detection_name=row['detection_name'],
+                detection_score=-1.0,  # GT samples do not have a score.
+                attribute_name=row['attribute_name'],
+                box_token=row['token'],
+            ))
+        if verbose:
+            print("Loaded ground truth annotations for {} samples.".format(len(all_annotations.sample_tokens)))
+        return all_annotations
+
     sample_tokens = []
     for sample_token in sample_tokens_all:
         scene_token = nusc.get('sample', sample_token)['scene_token']
@@ -122,6 +122,8 @@ class Attention(nn.Module):
            nn.init.constant_(self.lora_wv_l2.weight.data, 0)
            nn.init.constant_(self.lora_wo_l2.weight.data, 0)
 
+        # allocated lazily by `reserve_cache` on the first eval forward and kept
+        # across train()/eval() toggles instead of being rebuilt on every call
         self.cache_k = None
         self.cache_v = None
 
@@ -132,18 +134,47 @@ class Attention(nn.Module):
             self.new_gate = torch.nn.Parameter(torch.ones(1, 1, 1, 1))
 
 
-    def train(self, mode: bool = True):
-        if mode:
-            self.cache_k = None
-            self.cache_v = None
-        else:
-            self.cache_k = torch.zeros(
-                (self.args.max_batch_size, self.args.max_seq_len, self.n_local_heads, self.head_dim)
-            ).cuda()
-            self.cache_v = torch.zeros(
-                (self.args.max_batch_size, self.args.max_seq_len, self.n_local_heads, self.head_dim)
-            ).cuda()
-        return super().train(mode)
+    def reserve_cache(self, bsz: int, seqlen: int, like: torch.Tensor):
+        """Make sure the kv cache holds `bsz` rows of `seqlen` positions in the dtype of `like`.
+
+        The cache starts at the size actually requested and grows on demand, keeping
+        the entries written so far. It never exceeds (max_batch_size, max_seq_len).
+        """
+        assert bsz <= self.args.max_batch_size, (bsz, self.args.max_batch_size)
+        assert seqlen <= self.args.max_seq_len, (seqlen, self.args.max_seq_len)
+        cache_k, cache_v = self.cache_k, self.cache_v
+        if cache_k is not None and cache_k.device == like.device and cache_k.dtype == like.dtype \
+                and cache_k.shape[0] >= bsz and cache_k.shape[1] >= seqlen:
+            return
+
+        cache_bsz, cache_len = bsz, seqlen
+        if cache_k is not None:
+            cache_bsz = max(cache_bsz, cache_k.shape[0])
+            cache_len = max(cache_len, cache_k.shape[1])
+            if seqlen > cache_k.shape[1]:
+                # grow geometrically so decoding does not reallocate every step
+                cache_len = max(cache_len, 2 * cache_k.shape[1])
+        cache_len = min(self.args.max_seq_len, 64 * ((cache_len + 63) // 64))
+
+        shape = (cache_bsz, cache_len, self.n_local_heads, self.head_dim)
+        self.cache_k = torch.zeros(shape, dtype=like.dtype, device=like.device)
+        self.cache_v = torch.zeros(shape, dtype=like.dtype, device=like.device)
+        if cache_k is not None:
+            old_bsz, old_len = cache_k.shape[:2]
+            self.cache_k[:old_bsz, :old_len] = cache_k
+            self.cache_v[:old_bsz, :old_len] = cache_v
+
+    def fill_cache(self, keys: torch.Tensor, values: torch.Tensor, bsz: int):
+        """Broadcast precomputed (1, seqlen, heads, head_dim) prefix entries into the first `bsz` rows."""
+        seqlen = keys.shape[1]
+        self.reserve_cache(bsz, seqlen, keys)
+        self.cache_k[:bsz, :seqlen] = keys
+        self.cache_v[:bsz, :seqlen] = values
+
+    def select_cache_rows(self, index: torch.Tensor, seqlen: int):
+        """Keep only the cached rows in `index`, packed to the front of the cache."""
+        self.cache_k[:len(index), :seqlen] = self.cache_k[index, :seqlen]
+        self.cache_v[:len(index), :seqlen] = self.cache_v[index, :seqlen]
 
 
     def forward(self, x: torch.Tensor, start_pos: int, freqs_cis: torch.Tensor, mask: Optional[torch.Tensor], adapter=None):
@@ -161,8 +192,7 @@ class Attention(nn.Module):
         xq, xk = apply_rotary_emb(xq, xk, freqs_cis=freqs_cis)
 
         if not self.training:
-            self.cache_k = self.cache_k.to(xq)
-            self.cache_v = self.cache_v.to(xq)
+            self.reserve_cache(bsz, start_pos + seqlen, xk)
 
             self.cache_k[:bsz, start_pos : start_pos + seqlen] = xk
             self.cache_v[:bsz, start_pos : start_pos + seqlen] = xv
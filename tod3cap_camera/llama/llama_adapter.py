@@ -90,10 +90,19 @@ class LLaMA_adapter(nn.Module):
         self.phase = phase
         self.get_trainable_params(self.phase)
 
+        # 8. prompt prefix cache, see `get_prefix_cache`
+        self.prefix_cache = {}
+
         for name, param in self.named_parameters():
             if param.requires_grad:
                print(f"Trainable param: {name}, {param.shape}, {param.dtype}")
 
+    def train(self, mode: bool = True):
+        if mode:
+            # cached prefix activations go stale once the llama weights are updated
+            self.prefix_cache.clear()
+        return super().train(mode)
+
     def get_trainable_params(self, phase='finetune'):
         print("phase", phase)
         for name, para in self.named_parameters():
@@ -141,9 +150,12 @@ class LLaMA_adapter(nn.Module):
     #     return x
 
 
-    def forward_visual(self, det_inputs):
-        feats, pred = det_inputs
+    def forward_bev(self, feats):
+        """Project BEV features (F, H*W, C) to visual tokens.
 
+        The tokens only depend on the frame, so they are computed once per frame and
+        shared by every box of that frame (see `bev_inds` in `forward_visual`).
+        """
         feats = feats.permute(0, 2, 1) # B 256 2500
         
         bev_size = int(feats.size(-1)**0.5)
@@ -154,7 +166,23 @@ class LLaMA_adapter(nn.Module):
         feats = feats.view(len(feats), self.bev_dim, -1)
         feats = feats.permute(0, 2, 1)    # B bev_size/5*bev_size/5 256
 
-        clip_feats = self.bev_proj_norm(self.bev_proj(feats.float()))
+        return self.bev_proj_norm(self.bev_proj(feats.float()))
+
+    def forward_visual(self, det_inputs, bev_inds=None):
+        """Visual query of each box.
+
+        Args:
+            det_inputs (tuple): BEV features and boxes (N, 10). Without `bev_inds` the
+                BEV features hold one frame per box, (N, H*W, C).
+            bev_inds (torch.Tensor, optional): Frame index (N,) of each box into BEV
+                features of shape (F, H*W, C), so that the BEV tokens are projected
+                once per frame instead of once per box.
+        """
+        feats, pred = det_inputs
+
+        clip_feats = self.forward_bev(feats)
+        if bev_inds is not None:
+            clip_feats = clip_feats[bev_inds]
 
         bbox_query = self.bbox_query(pred.unsqueeze(-2))
         bbox_query = bbox_query    # B 1 768
@@ -169,12 +197,24 @@ class LLaMA_adapter(nn.Module):
 
         return bbox_query
 
-    def forward(self, cap_inputs, det_inputs):
+    def forward(self, cap_inputs, det_inputs, bev_inds=None):
         tokens, labels, c_weights = cap_inputs
         feats, obj_pred_box = det_inputs
 
-        bbox_query = self.forward_visual(det_inputs)
+        bbox_query = self.forward_visual(det_inputs, bev_inds)
 
+        # rows come padded with 0 to the longest caption of their frame, drop
+        # the columns past the last real token of any row; padding sits after
+        # every real token, so the causal mask already hides it. Token id 0
+        # can also occur inside a caption, so this is the position of the last
+        # nonzero token and not their count
+        if tokens.numel() > 0:
+            positions = torch.arange(1, tokens.size(1) + 1, device=tokens.device)
+            seqlen = int(((tokens.ne(0) | labels.ne(0)) * positions).max())
+        else:
+            seqlen = 0
+        tokens = tokens[:, :max(seqlen, 2)].long()
+        labels = labels[:, :max(seqlen, 2)].long()
         _bsz, seqlen = tokens.shape
 
         h = self.llama.tok_embeddings(tokens)
@@ -213,17 +253,53 @@ class LLaMA_adapter(nn.Module):
         return c_loss
 
     @torch.inference_mode()
-    def forward_inference(self, bbox_query, tokens, start_pos: int):
+    def get_prefix_cache(self, prefix):
+        """Hidden states and kv entries of a prompt prefix through the layers without adapter.
+
+        The first `n_layers - query_layer` layers never see the visual query, so their
+        output for a fixed prompt is the same for every object. It is computed once and
+        kept in `self.prefix_cache` until the model is switched back to training.
+        """
+        key = tuple(prefix)
+        if key not in self.prefix_cache:
+            tokens = torch.tensor(prefix).cuda().long().unsqueeze(0)
+            seqlen = tokens.shape[1]
+            h = self.llama.tok_embeddings(tokens)
+            freqs_cis = self.llama.freqs_cis.to(h.device)
+            freqs_cis = freqs_cis[:seqlen]
+            mask = torch.full((1, 1, seqlen, seqlen), float("-inf"), device=h.device)
+            mask = torch.triu(mask, diagonal=1).type_as(h)
+
+            prefix_kv = []
+            for layer in self.llama.layers[:-1 * self.query_layer]:
+                h = layer(h, 0, freqs_cis, mask)
+                prefix_kv.append((layer.attention.cache_k[:1, :seqlen].clone(),
+                                  layer.attention.cache_v[:1, :seqlen].clone()))
+            self.prefix_cache[key] = (h, prefix_kv)
+        return self.prefix_cache[key]
+
+    @torch.inference_mode()
+    def forward_inference(self, bbox_query, tokens, start_pos: int, prefix=None):
         _bsz, seqlen = tokens.shape
-        h = self.llama.tok_embeddings(tokens)
-        freqs_cis = self.llama.freqs_cis.to(h.device)
+        freqs_cis = self.llama.freqs_cis.to(tokens.device)
         freqs_cis = freqs_cis[start_pos : start_pos + seqlen]
+
+        if prefix is not None:
+            # tokens is exactly the cached prefix: reuse the output of the layers without adapter
+            assert start_pos == 0
+            h, prefix_kv = prefix
+            h = h.expand(_bsz, -1, -1)
+            for layer, (keys, values) in zip(self.llama.layers[:-1 * self.query_layer], prefix_kv):
+                layer.attention.fill_cache(keys, values, _bsz)
+        else:
+            h = self.llama.tok_embeddings(tokens)
         mask = None
         mask = torch.full((1, 1, seqlen, seqlen), float("-inf"), device=h.device)
         mask = torch.triu(mask, diagonal=start_pos + 1).type_as(h)
 
-        for layer in self.llama.layers[:-1 * self.query_layer]:
-            h = layer(h, start_pos, freqs_cis, mask)
+        if prefix is None:
+            for layer in self.llama.layers[:-1 * self.query_layer]:
+                h = layer(h, start_pos, freqs_cis, mask)
 
         adapter = self.adapter_query.weight.reshape(self.query_layer, self.query_len, -1).unsqueeze(1)
         adapter_index = 0
@@ -244,20 +320,56 @@ class LLaMA_adapter(nn.Module):
         max_gen_len: int = 256,
         temperature: float = 0.1,
         top_p: float = 0.75,
+        use_prefix_cache: bool = True,
+        bucket_by_length: bool = False,
+        bev_inds=None,
     ):
         prompts = cap_inputs
 
-        bsz = len(det_inputs[0])
+        bsz = len(det_inputs[1])
         params = self.llama.params
-        assert bsz <= params.max_batch_size, (bsz, params.max_batch_size)
-        assert len(det_inputs[0]) == len(prompts)
+        assert len(det_inputs[1]) == len(prompts)
 
+        # the visual query of every row is computed up front in one batch, so the
+        # BEV tokens of a frame are projected once however the rows are split below
         with torch.cuda.amp.autocast():
-            bbox_query = self.forward_visual(det_inputs)
+            bbox_query = self.forward_visual(det_inputs, bev_inds)
 
         if isinstance(prompts[0], str):
             prompts = [self.tokenizer.encode(x, bos=True, eos=False) for x in prompts]
 
+        # split the rows into decode batches of at most max_batch_size rows (the kv
+        # cache limit); with bucket_by_length each batch only holds prompts of one
+        # length, so no row is prefilled token by token from a shorter row's start
+        order = list(range(bsz))
+        if bucket_by_length:
+            order.sort(key=lambda i: len(prompts[i]))
+        groups = []
+        for i in order:
+            if len(groups) == 0 or len(groups[-1]) == params.max_batch_size or \
+                    (bucket_by_length and len(prompts[i]) != len(prompts[groups[-1][0]])):
+                groups.append([])
+            groups[-1].append(i)
+
+        if len(groups) == 1:
+            return self._generate(bbox_query, prompts, max_gen_len, temperature, top_p, use_prefix_cache)
+
+        decoded = [None] * bsz
+        for group in groups:
+            index = torch.tensor(group, device=bbox_query.device)
+            group_decoded = self._generate(
+                bbox_query[index], [prompts[i] for i in group],
+                max_gen_len, temperature, top_p, use_prefix_cache)
+            for i, caption in zip(group, group_decoded):
+                decoded[i] = caption
+        return decoded
+
+    @torch.inference_mode()
+    def _generate(self, bbox_query, prompts, max_gen_len, temperature, top_p, use_prefix_cache):
+        """Decode one batch of tokenized prompts, stopping once every row has emitted eos."""
+        bsz = len(prompts)
+        params = self.llama.params
+
         min_prompt_size = min([len(t) for t in prompts])
         max_prompt_size = max([len(t) for t in prompts])
 
@@ -270,9 +382,20 @@ class LLaMA_adapter(nn.Module):
         input_text_mask = tokens != self.tokenizer.pad_id
         start_pos = min_prompt_size
         prev_pos = 0
+
+        # all rows share the instruction prompt, so the prefill of the layers
+        # without adapter can be served from the prefix cache
+        prefix = None
+        if use_prefix_cache and all(t[:start_pos] == prompts[0][:start_pos] for t in prompts):
+            with torch.cuda.amp.autocast():
+                prefix = self.get_prefix_cache(prompts[0][:start_pos])
+        # rows of `tokens` that are still decoding, in the order they occupy
+        # the kv cache; rows that emit eos are dropped so they stop costing compute
+        active = torch.arange(bsz, device=tokens.device)
         for cur_pos in range(start_pos, total_len):
             with torch.cuda.amp.autocast():
-                logits = self.forward_inference(bbox_query, tokens[:, prev_pos:cur_pos], prev_pos)
+                logits = self.forward_inference(bbox_query, tokens[active, prev_pos:cur_pos], prev_pos,
+                                                prefix=prefix if prev_pos == 0 else None)
             if temperature > 0:
                 probs = torch.softmax(logits / temperature, dim=-1)
                 next_token = sample_top_p(probs, top_p)
@@ -280,15 +403,23 @@ class LLaMA_adapter(nn.Module):
                 next_token = torch.argmax(logits, dim=-1)
             next_token = next_token.reshape(-1)
 
+            in_prompt = input_text_mask[active, cur_pos]
             next_token = torch.where(
-                input_text_mask[:, cur_pos], tokens[:, cur_pos], next_token
+                in_prompt, tokens[active, cur_pos], next_token
             )
-            tokens[:, cur_pos] = next_token
-            # trick: early stop if bsz==1
-            if bsz == 1 and next_token[0] == self.tokenizer.eos_id:
-                break
+            tokens[active, cur_pos] = next_token
             prev_pos = cur_pos
 
+            finished = ~in_prompt & (next_token == self.tokenizer.eos_id)
+            if finished.any():
+                keep = (~finished).nonzero().squeeze(1)
+                if keep.numel() == 0:
+                    break
+                active = active[keep]
+                bbox_query = bbox_query[keep]
+                for layer in self.llama.layers:
+                    layer.attention.select_cache_rows(keep, cur_pos)
+
         decoded = []
         for i, t in enumerate(tokens.tolist()):
 
@@ -0,0 +1,273 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+"""CPU version of the rotated iou of `rotate_iou.py`.
+
+The same polygon clipping as the ``numba.cuda`` kernels, compiled with
+``numba.njit`` and parallel over the boxes, for machines without CUDA.
+Divisions follow the NumPy error model, so degenerate boxes (touching
+corners, zero area) give 0 or nan as on the GPU instead of raising
+``ZeroDivisionError``.
+"""
+import math
+import numba
+import numpy as np
+
+
+@numba.njit(inline='always', error_model='numpy')
+def trangle_area(a0, a1, b0, b1, c0, c1):
+    return ((a0 - c0) * (b1 - c1) - (a1 - c1) * (b0 - c0)) / 2.0
+
+
+@numba.njit(error_model='numpy')
+def area(int_pts, num_of_inter):
+    area_val = 0.0
+    for i in range(num_of_inter - 2):
+        area_val += abs(
+            trangle_area(int_pts[0], int_pts[1], int_pts[2 * i + 2],
+                         int_pts[2 * i + 3], int_pts[2 * i + 4],
+                         int_pts[2 * i + 5]))
+    return area_val
+
+
+@numba.njit(error_model='numpy')
+def sort_vertex_in_convex_polygon(int_pts, num_of_inter):
+    if num_of_inter > 0:
+        center_x = 0.0
+        center_y = 0.0
+        for i in range(num_of_inter):
+            center_x += int_pts[2 * i]
+            center_y += int_pts[2 * i + 1]
+        center_x /= num_of_inter
+        center_y /= num_of_inter
+        vs = np.zeros((16, ), dtype=np.float32)
+        for i in range(num_of_inter):
+            v0 = int_pts[2 * i] - center_x
+            v1 = int_pts[2 * i + 1] - center_y
+            d = math.sqrt(v0 * v0 + v1 * v1)
+            v0 = v0 / d
+            v1 = v1 / d
+            if v1 < 0:
+                v0 = -2 - v0
+            vs[i] = v0
+        for i in range(1, num_of_inter):
+            if vs[i - 1] > vs[i]:
+                temp = vs[i]
+                tx = int_pts[2 * i]
+                ty = int_pts[2 * i + 1]
+                j = i
+                while j > 0 and vs[j - 1] > temp:
+                    vs[j] = vs[j - 1]
+                    int_pts[j * 2] = int_pts[j * 2 - 2]
+                    int_pts[j * 2 + 1] = int_pts[j * 2 - 1]
+                    j -= 1
+
+                vs[j] = temp
+                int_pts[j * 2] = tx
+                int_pts[j * 2 + 1] = ty
+
+
+@numba.njit(error_model='numpy')
+def line_segment_intersection(pts1, pts2, i, j, temp_pts):
+    A0 = pts1[2 * i]
+    A1 = pts1[2 * i + 1]
+    B0 = pts1[2 * ((i + 1) % 4)]
+    B1 = pts1[2 * ((i + 1) % 4) + 1]
+    C0 = pts2[2 * j]
+    C1 = pts2[2 * j + 1]
+    D0 = pts2[2 * ((j + 1) % 4)]
+    D1 = pts2[2 * ((j + 1) % 4) + 1]
+
+    BA0 = B0 - A0
+    BA1 = B1 - A1
+    DA0 = D0 - A0
+    CA0 = C0 - A0
+    DA1 = D1 - A1
+    CA1 = C1 - A1
+    acd = DA1 * CA0 > CA1 * DA0
+    bcd = (D1 - B1) * (C0 - B0) > (C1 - B1) * (D0 - B0)
+    if acd != bcd:
+        abc = CA1 * BA0 > BA1 * CA0
+        abd = DA1 * BA0 > BA1 * DA0
+        if abc != abd:
+            DC0 = D0 - C0
+            DC1 = D1 - C1
+            ABBA = A0 * B1 - B0 * A1
+            CDDC = C0 * D1 - D0 * C1
+            DH = BA1 * DC0 - BA0 * DC1
+            Dx = ABBA * DC0 - BA0 * CDDC
+            Dy = ABBA * DC1 - BA1 * CDDC
+            temp_pts[0] = Dx / DH
+            temp_pts[1] = Dy / DH
+            return True
+    return False
+
+
+@numba.njit(error_model='numpy')
+def point_in_quadrilateral(pt_x, pt_y, corners):
+    ab0 = corners[2] - corners[0]
+    ab1 = corners[3] - corners[1]
+
+    ad0 = corners[6] - corners[0]
+    ad1 = corners[7] - corners[1]
+
+    ap0 = pt_x - corners[0]
+    ap1 = pt_y - corners[1]
+
+    abab = ab0 * ab0 + ab1 * ab1
+    abap = ab0 * ap0 + ab1 * ap1
+    adad = ad0 * ad0 + ad1 * ad1
+    adap = ad0 * ap0 + ad1 * ap1
+
+    return abab >= abap and abap >= 0 and adad >= adap and adap >= 0
+
+
+@numba.njit(error_model='numpy')
+def quadrilateral_intersection(pts1, pts2, int_pts):
+    num_of_inter = 0
+    for i in range(4):
+        if point_in_quadrilateral(pts1[2 * i], pts1[2 * i + 1], pts2):
+            int_pts[num_of_inter * 2] = pts1[2 * i]
+            int_pts[num_of_inter * 2 + 1] = pts1[2 * i + 1]
+            num_of_inter += 1
+        if point_in_quadrilateral(pts2[2 * i], pts2[2 * i + 1], pts1):
+            int_pts[num_of_inter * 2] = pts2[2 * i]
+            int_pts[num_of_inter * 2 + 1] = pts2[2 * i + 1]
+            num_of_inter += 1
+    temp_pts = np.zeros((2, ), dtype=np.float32)
+    for i in range(4):
+        for j in range(4):
+            has_pts = line_segment_intersection(pts1, pts2, i, j, temp_pts)
+            if has_pts:
+                int_pts[num_of_inter * 2] = temp_pts[0]
+                int_pts[num_of_inter * 2 + 1] = temp_pts[1]
+                num_of_inter += 1
+
+    return num_of_inter
+
+
+@numba.njit(error_model='numpy')
+def rbbox_to_corners(corners, rbbox):
+    # generate clockwise corners and rotate it clockwise
+    angle = rbbox[4]
+    a_cos = math.cos(angle)
+    a_sin = math.sin(angle)
+    center_x = rbbox[0]
+    center_y = rbbox[1]
+    x_d = rbbox[2]
+    y_d = rbbox[3]
+    corners_x = np.array([-x_d / 2, -x_d / 2, x_d / 2, x_d / 2])
+    corners_y = np.array([-y_d / 2, y_d / 2, y_d / 2, -y_d / 2])
+    for i in range(4):
+        corners[2 * i] = a_cos * corners_x[i] + a_sin * corners_y[i] + center_x
+        corners[2 * i +
+                1] = -a_sin * corners_x[i] + a_cos * corners_y[i] + center_y
+
+
+@numba.njit(error_model='numpy')
+def inter(rbbox1, rbbox2):
+    """Compute intersection of two rotated boxes.
+
+    Args:
+        rbox1 (np.ndarray, shape=[5]): Rotated 2d box.
+        rbox2 (np.ndarray, shape=[5]): Rotated 2d box.
+
+    Returns:
+        float: Intersection of two rotated boxes.
+    """
+    corners1 = np.zeros((8, ), dtype=np.float32)
+    corners2 = np.zeros((8, ), dtype=np.float32)
+    intersection_corners = np.zeros((16, ), dtype=np.float32)
+
+    rbbox_to_corners(corners1, rbbox1)
+    rbbox_to_corners(corners2, rbbox2)
+
+    num_intersection = quadrilateral_intersection(corners1, corners2,
+                                                  intersection_corners)
+    sort_vertex_in_convex_polygon(intersection_corners, num_intersection)
+
+    return area(intersection_corners, num_intersection)
+
+
+@numba.njit(error_model='numpy')
+def rotate_iou_pair(rbox1, rbox2, criterion=-1):
+    """Compute rotated iou of two boxes, like `devRotateIoUEval`.
+
+    Args:
+        rbox1 (np.ndarray, shape=[5]): Rotated 2d box.
+        rbox2 (np.ndarray, shape=[5]): Rotated 2d box.
+        criterion (int, optional): Indicate different type of iou.
+            -1 indicate `area_inter / (area1 + area2 - area_inter)`,
+            0 indicate `area_inter / area1`,
+            1 indicate `area_inter / area2`.
+
+    Returns:
+        float: iou between two input boxes.
+    """
+    area1 = rbox1[2] * rbox1[3]
+    area2 = rbox2[2] * rbox2[3]
+    area_inter = inter(rbox1, rbox2)
+    if criterion == -1:
+        return area_inter / (area1 + area2 - area_inter)
+    elif criterion == 0:
+        return area_inter / area1
+    elif criterion == 1:
+        return area_inter / area2
+    else:
+        return area_inter
+
+
+@numba.njit(parallel=True, error_model='numpy')
+def rotate_iou_kernel_cpu(boxes, query_boxes, iou, criterion=-1):
+    N, K = boxes.shape[0], query_boxes.shape[0]
+    for n in numba.prange(N):
+        for k in range(K):
+            # the query box comes first, as in `rotate_iou_kernel_eval`
+            iou[n, k] = rotate_iou_pair(query_boxes[k], boxes[n], criterion)
+
+
+def rotate_iou_cpu_eval(boxes, query_boxes, criterion=-1):
+    """Rotated box iou running on the CPU, same results as
+    `rotate_iou_gpu_eval`.
+
+    Args:
+        boxes (np.ndarray): rbboxes. format: centers, dims,
+            angles(clockwise when positive) with the shape of [N, 5].
+        query_boxes (np.ndarray): rbboxes to compute iou with boxes,
+            with the shape of [K, 5].
+        criterion (int, optional): Indicate different type of iou.
+            -1 indicate `area_inter / (area1 + area2 - area_inter)`,
+            0 indicate `area_inter / area1`,
+            1 indicate `area_inter / area2`.
+
+    Returns:
+        np.ndarray: IoU results.
+    """
+    boxes = np.ascontiguousarray(boxes, dtype=np.float32)
+    query_boxes = np.ascontiguousarray(query_boxes, dtype=np.float32)
+    N = boxes.shape[0]
+    K = query_boxes.shape[0]
+    iou = np.zeros((N, K), dtype=np.float32)
+    if N == 0 or K == 0:
+        return iou
+    rotate_iou_kernel_cpu(boxes, query_boxes, iou, criterion)
+    return iou
+
+
+def rotate_iou_eval(boxes, query_boxes, criterion=-1, device_id=0):
+    """Rotated box iou, with the ``numba.cuda`` kernels if CUDA is available
+    and on the CPU otherwise.
+
+    Args:
+        boxes (np.ndarray): rbboxes with the shape of [N, 5].
+        query_boxes (np.ndarray): rbboxes with the shape of [K, 5].
+        criterion (int, optional): Indicate different type of iou, see
+            `rotate_iou_cpu_eval`.
+        device_id (int, optional): Defaults to 0. Device to use with CUDA.
+
+    Returns:
+        np.ndarray: IoU results.
+    """
+    from numba import cuda
+    if cuda.is_available():
+        from .rotate_iou import rotate_iou_gpu_eval
+        return rotate_iou_gpu_eval(boxes, query_boxes, criterion, device_id)
+    return rotate_iou_cpu_eval(boxes, query_boxes, criterion)
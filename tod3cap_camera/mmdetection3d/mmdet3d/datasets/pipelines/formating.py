@@ -1,5 +1,6 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import numpy as np
+import torch
 from mmcv.parallel import DataContainer as DC
 
 from mmdet3d.core.bbox import BaseInstance3DBoxes
@@ -42,7 +43,11 @@ class DefaultFormatBundle(object):
                 default bundle.
         """
         if 'img' in results:
-            if isinstance(results['img'], list):
+            if isinstance(results['img'], torch.Tensor):
+                # already stacked and transposed, e.g. by
+                # `NormalizePadMultiViewImage` of the BEVFormer plugin
+                results['img'] = DC(results['img'], stack=True)
+            elif isinstance(results['img'], list):
                 # process multiple imgs in single frame
                 imgs = [img.transpose(2, 0, 1) for img in results['img']]
                 imgs = np.ascontiguousarray(np.stack(imgs, axis=0))
@@ -0,0 +1,81 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import numpy as np
+import pytest
+import torch
+
+from mmdet3d.core.evaluation.kitti_utils.eval import (bev_box_overlap,
+                                                      d3_box_overlap)
+from mmdet3d.core.evaluation.kitti_utils.rotate_iou_cpu import \
+    rotate_iou_cpu_eval
+
+# (x, y, dx, dy, angle)
+boxes = np.array([[0., 0., 2., 2., 0.], [1., 0., 2., 2., 0.],
+                  [0., 0., 2., 2., np.pi / 4], [0., 0., 2., 2., np.pi / 2],
+                  [10., 10., 1., 3., 0.3], [10.5, 9.8, 1.2, 2.5, -0.4]],
+                 dtype=np.float32)
+
+
+def test_rotate_iou_cpu_eval():
+    iou = rotate_iou_cpu_eval(boxes[:4], boxes[:1])
+    expected_iou = np.array([[1.], [1. / 3.], [1. / np.sqrt(2.)], [1.]])
+    assert iou.dtype == np.float32
+    assert np.allclose(iou, expected_iou, atol=1e-5)
+
+    # criterion 0 divides by the area of the query box, 1 by the box,
+    # 2 gives the intersection
+    boxes_2x = boxes[:2].copy()
+    boxes_2x[:, 2] *= 2
+    inter = rotate_iou_cpu_eval(boxes_2x, boxes[:1], 2)
+    assert np.allclose(inter, [[4.], [4.]], atol=1e-5)
+    assert np.allclose(
+        rotate_iou_cpu_eval(boxes_2x, boxes[:1], 0), [[1.], [1.]], atol=1e-5)
+    assert np.allclose(
+        rotate_iou_cpu_eval(boxes_2x, boxes[:1], 1), [[.5], [.5]], atol=1e-5)
+
+    # far away boxes do not overlap
+    assert np.allclose(rotate_iou_cpu_eval(boxes[4:], boxes[:4]), 0)
+    assert rotate_iou_cpu_eval(boxes[:0], boxes).shape == (0, 6)
+
+
+def test_rotate_iou_cpu_degenerate():
+    # boxes touching at a corner, the clipped polygon is a single point
+    touching = np.array([[0., 0., 2., 2., 0.], [2., 2., 2., 2., 0.]],
+                        dtype=np.float32)
+    iou = rotate_iou_cpu_eval(touching[:1], touching[1:])
+    assert np.allclose(iou, 0)
+    assert np.allclose(rotate_iou_cpu_eval(touching[:1], touching[1:], 2), 0)
+
+    # zero-area boxes give 0 / 0 = nan, as the CUDA kernels
+    empty = np.zeros((1, 5), dtype=np.float32)
+    assert np.isnan(rotate_iou_cpu_eval(empty, empty)).all()
+
+
+def test_rotate_iou_cpu_matches_gpu():
+    if not torch.cuda.is_available():
+        pytest.skip('test requires GPU and CUDA')
+    from mmdet3d.core.evaluation.kitti_utils.rotate_iou import \
+        rotate_iou_gpu_eval
+    rng = np.random.RandomState(0)
+    qboxes = np.concatenate([
+        rng.uniform(-5, 5, (70, 2)),
+        rng.uniform(0.5, 4, (70, 2)),
+        rng.uniform(-np.pi, np.pi, (70, 1))
+    ], axis=1).astype(np.float32)
+    for criterion in (-1, 0, 1, 2):
+        cpu_iou = rotate_iou_cpu_eval(qboxes[:65], qboxes, criterion)
+        gpu_iou = rotate_iou_gpu_eval(qboxes[:65], qboxes, criterion)
+        assert np.allclose(cpu_iou, gpu_iou, atol=1e-4)
+
+
+def test_box_overlap_cpu():
+    if torch.cuda.is_available():
+        pytest.skip('test of the CPU backend')
+    assert np.allclose(
+        bev_box_overlap(boxes[:4], boxes[:1]),
+        [[1.], [1. / 3.], [1. / np.sqrt(2.)], [1.]],
+        atol=1e-5)
+    # camera boxes (x, y, z, dx, dy, dz, ry), the height overlap is half
+    boxes_3d = np.array([[0., 0., 0., 2., 2., 2., 0.],
+                         [0., 1., 0., 2., 2., 2., 0.]])
+    assert np.allclose(
+        d3_box_overlap(boxes_3d, boxes_3d[:1]), [[1.], [1. / 3.]], atol=1e-5)
@@ -0,0 +1,34 @@
+# Caption training from a BEV feature cache.
+# The frozen encoder / detection head outputs are written once with
+#   python tools/precompute_bev_cache.py projects/configs/bevformer/bevformer_tiny_stage3_bevcache.py \
+#       ckpts/stage1.pth data/nuscenes/bev_cache --launcher pytorch
+# and the caption adapter is then trained from the cache without loading images.
+# Only the caption loss is trained (training_stage=2), the encoder and the
+# detection head keep the weights the cache was written with.
+# While the cache is written, the history BEV of a sample is mostly the BEV
+# of the previous samples of its scene, kept in history_bev_cache_size frames.
+
+_base_ = ['./bevformer_tiny_stage3.py']
+
+model = dict(training_stage=2, history_bev_cache_size=16)
+
+point_cloud_range = [-51.2, -51.2, -5.0, 51.2, 51.2, 3.0]
+class_names = [
+    'car', 'truck', 'construction_vehicle', 'bus', 'trailer', 'barrier',
+    'motorcycle', 'bicycle', 'pedestrian', 'traffic_cone'
+]
+
+# the annotation part of the stage-3 train pipeline, the gt boxes must be
+# filtered the same way as when the cache was written
+bev_cache_pipeline = [
+    dict(type='LoadAnnotations3D', with_bbox_3d=True, with_label_3d=True, with_caption_3d=True, with_attr_label=False),
+    dict(type='ObjectRangeFilter', point_cloud_range=point_cloud_range),
+    dict(type='ObjectNameFilter', classes=class_names),
+    dict(type='DefaultFormatBundle3D', class_names=class_names),
+    dict(type='CustomCollect3D', keys=['gt_bboxes_3d', 'gt_labels_3d', 'gt_captions_3d'])
+]
+
+data = dict(
+    train=dict(
+        bev_cache_root='data/nuscenes/bev_cache',
+        bev_cache_pipeline=bev_cache_pipeline))
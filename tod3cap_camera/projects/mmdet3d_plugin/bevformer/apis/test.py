@@ -96,6 +96,10 @@ def custom_multi_gpu_test(model, data_loader, tmpdir=None, gpu_collect=False):
         # # FIXME: for debug
         # break
 
+    # samplers that reorder the samples of a rank hand them back in dataset order
+    if hasattr(data_loader.sampler, 'restore_order'):
+        bbox_results = data_loader.sampler.restore_order(bbox_results)
+
     # collect results from all ranks
     if gpu_collect:
         bbox_results = collect_results_gpu(bbox_results, len(dataset))
@@ -221,7 +221,8 @@ class BEVFormerHead(DETRHead):
                            bbox_pred,
                            gt_labels,
                            gt_bboxes,
-                           gt_bboxes_ignore=None):
+                           gt_bboxes_ignore=None,
+                           assign_result=None):
         """"Compute regression and classification targets for one image.
         Outputs from a single decoder layer of a single feature level are used.
         Args:
@@ -236,6 +237,9 @@ class BEVFormerHead(DETRHead):
                 with shape (num_gts, ).
             gt_bboxes_ignore (Tensor, optional): Bounding boxes
                 which can be ignored. Default None.
+            assign_result (:obj:`AssignResult`, optional): Matching of the
+                image computed for the whole batch. Default None, computed
+                here.
         Returns:
             tuple[Tensor]: a tuple containing the following for one image.
                 - labels (Tensor): Labels of each image.
@@ -250,8 +254,9 @@ class BEVFormerHead(DETRHead):
         # assigner and sampler
         gt_c = gt_bboxes.shape[-1]
 
-        assign_result = self.assigner.assign(bbox_pred, cls_score, gt_bboxes,
-                                             gt_labels, gt_bboxes_ignore)
+        if assign_result is None:
+            assign_result = self.assigner.assign(bbox_pred, cls_score, gt_bboxes,
+                                                 gt_labels, gt_bboxes_ignore)
 
         sampling_result = self.sampler.sample(assign_result, bbox_pred,
                                               gt_bboxes)
@@ -316,11 +321,18 @@ class BEVFormerHead(DETRHead):
         gt_bboxes_ignore_list = [
             gt_bboxes_ignore_list for _ in range(num_imgs)
         ]
+        # one cost computation, host copy and solve for the whole batch
+        if hasattr(self.assigner, 'assign_batch'):
+            assign_results = self.assigner.assign_batch(
+                torch.stack(bbox_preds_list), torch.stack(cls_scores_list),
+                gt_bboxes_list, gt_labels_list)
+        else:
+            assign_results = [None] * num_imgs
 
         (labels_list, label_weights_list, bbox_targets_list,
          bbox_weights_list, pos_inds_list, neg_inds_list, sampling_result_list) = multi_apply(
             self._get_target_single, cls_scores_list, bbox_preds_list,
-            gt_labels_list, gt_bboxes_list, gt_bboxes_ignore_list)
+            gt_labels_list, gt_bboxes_list, gt_bboxes_ignore_list, assign_results)
         num_total_pos = sum((inds.numel() for inds in pos_inds_list))
         num_total_neg = sum((inds.numel() for inds in neg_inds_list))
         return (labels_list, label_weights_list, bbox_targets_list,
@@ -665,13 +677,15 @@ class BEVFormerHead(DETRHead):
     #             pos_inds, neg_inds)
 
     @force_fp32(apply_to=('preds_dicts'))
-    def get_bboxes(self, preds_dicts, img_metas, rescale=False):
+    def get_bboxes(self, preds_dicts, img_metas, rescale=False, with_query_inds=False):
         """Generate bboxes from bbox head predictions.
         Args:
             preds_dicts (tuple[list[dict]]): Prediction results.
             img_metas (list[dict]): Point cloud and image's meta info.
+            with_query_inds (bool): Also return the query of every box.
         Returns:
-            list[dict]: Decoded bbox, scores and labels after nms.
+            list[list]: Decoded bbox, scores and labels after nms, and the
+                query indices of the boxes if ``with_query_inds``.
         """
 
         preds_dicts = self.bbox_coder.decode(preds_dicts)
@@ -689,7 +703,10 @@ class BEVFormerHead(DETRHead):
             scores = preds['scores']
             labels = preds['labels']
 
-            ret_list.append([bboxes, scores, labels])
+            if with_query_inds:
+                ret_list.append([bboxes, scores, labels, preds['query_inds']])
+            else:
+                ret_list.append([bboxes, scores, labels])
 
         return ret_list
 
@@ -13,6 +13,8 @@ from mmdet3d.models.detectors.mvx_two_stage import MVXTwoStageDetector
 from projects.mmdet3d_plugin.models.utils.grid_mask import GridMask
 import time
 import copy
+from collections import OrderedDict
+from types import SimpleNamespace
 import numpy as np
 import mmdet3d
 from projects.mmdet3d_plugin.models.utils.bricks import run_time
@@ -29,6 +31,26 @@ class BEVFormer(MVXTwoStageDetector):
     """BEVFormer.
     Args:
         video_test_mode (bool): Decide whether to use temporal information during inference.
+        max_test_scenes (int): Number of scenes whose temporal state (previous
+            BEV and ego pose) is kept during video inference, the least
+            recently used scene is dropped first. It must be at least the
+            number of scenes interleaved in a test batch.
+        img_norm_cfg (dict, optional): ``mean`` and ``std`` to normalize the
+            images with on the GPU, for pipelines that defer normalization
+            (``NormalizePadMultiViewImage`` with ``normalize=False``).
+        caption_budget (int, optional): Maximum number of boxes captioned per
+            frame at test time, the decoded boxes of highest score. The other
+            decoded boxes get ``None`` as caption. Default 64, None captions
+            every decoded box.
+        history_bev_cache_size (int): Number of frames whose BEV is kept for
+            reuse as history of later training samples, so that a frame seen
+            before, as history or as current frame, does not go through the
+            image backbone again. The cached BEV were computed with the weights
+            of that iteration, so they are exact only while the image backbone
+            and the encoder are not trained (e.g. `precompute_bev_cache`).
+            Walk the scenes in order (``scene_order=True`` of
+            `DistributedGroupSampler`) to keep the hit rate high. Default 0,
+            no cache.
     """
 
     def __init__(self,
@@ -49,7 +71,11 @@ class BEVFormer(MVXTwoStageDetector):
                  train_cfg=None,
                  test_cfg=None,
                  pretrained=None,
-                 video_test_mode=False
+                 video_test_mode=False,
+                 max_test_scenes=16,
+                 img_norm_cfg=None,
+                 caption_budget=64,
+                 history_bev_cache_size=0
                  ):
 
         super(BEVFormer,
@@ -63,15 +89,18 @@ class BEVFormer(MVXTwoStageDetector):
             True, True, rotate=1, offset=False, ratio=0.5, mode=1, prob=0.7)
         self.use_grid_mask = use_grid_mask
         self.fp16_enabled = False
+        self.img_norm_cfg = img_norm_cfg
+        self.caption_budget = caption_budget
 
         # temporal
         self.video_test_mode = video_test_mode
-        self.prev_frame_info = {
-            'prev_bev': None,
-            'scene_token': None,
-            'prev_pos': 0,
-            'prev_angle': 0,
-        }
+        self.max_test_scenes = max_test_scenes
+        # scene_token -> {'prev_bev': (bev_h*bev_w, embed_dims), 'prev_pos', 'prev_angle'}
+        # of the last frame of every in-flight scene
+        self.prev_frame_infos = OrderedDict()
+        self.history_bev_cache_size = history_bev_cache_size
+        # sample token -> (bev_h*bev_w, embed_dims) BEV of the frame
+        self.history_bev_cache = OrderedDict()
         self.max_voxels = pts_voxel_layer["max_voxels"]
         self.max_num_points = pts_voxel_layer["max_num_points"]
         self.voxel_size = pts_voxel_layer["voxel_size"]
@@ -116,6 +145,12 @@ class BEVFormer(MVXTwoStageDetector):
             elif img.dim() == 5 and img.size(0) > 1:
                 B, N, C, H, W = img.size()
                 img = img.reshape(B * N, C, H, W)
+            if img.dtype != torch.float32 and not self.fp16_enabled:
+                img = img.float()
+            if self.img_norm_cfg is not None:
+                mean = img.new_tensor(self.img_norm_cfg['mean']).view(1, -1, 1, 1)
+                std = img.new_tensor(self.img_norm_cfg['std']).view(1, -1, 1, 1)
+                img = (img - mean) / std
             if self.use_grid_mask:
                 img = self.grid_mask(img)
 
@@ -216,6 +251,8 @@ class BEVFormer(MVXTwoStageDetector):
             fused_bev = self.pts_backbone(fused_bev)
             fused_bev = self.pts_neck(fused_bev)
             outs['bev_embed'] = fused_bev[0].reshape(pts_feats.shape[0], pts_feats.shape[1], -1).permute(2, 0, 1)
+        # the current frame is the history of the next samples of its scene
+        self.put_history_bev(img_metas, outs['bev_embed'].permute(1, 0, 2))
 
         loss_inputs = [gt_bboxes_3d, gt_labels_3d, outs]
 
@@ -288,78 +325,72 @@ class BEVFormer(MVXTwoStageDetector):
             sampled_indices = _downsamplecap(num_total_pos, 8)
 
             bbox_preds = bbox_preds[pos_inds[sampled_indices]]
-            bev_embed = bev_embed.unsqueeze(0).repeat(8, 1, 1)
+            # the BEV tokens are projected once and shared by the sampled boxes
+            bev_embed = bev_embed.unsqueeze(0)
+            bev_inds = bev_embed.new_zeros((8,), dtype=torch.long)
 
             caption_targets = gt_captions[sampling_result.pos_assigned_gt_inds[sampled_indices]]
             caplabel_targets = gt_caplabels[sampling_result.pos_assigned_gt_inds[sampled_indices]]
             caption_weights = caption_targets.new_ones((8,), dtype=torch.long)
 
             with torch.cuda.amp.autocast():
-                caption_loss = self.llama_adapter((caption_targets, caplabel_targets, caption_weights), (bev_embed, bbox_preds))
+                caption_loss = self.llama_adapter((caption_targets, caplabel_targets, caption_weights), (bev_embed, bbox_preds), bev_inds)
 
             loss.append(caption_loss)
 
 
         return torch.stack(loss, dim=0).mean()
 
-    def generate_caption(self, outs, x):
+    def generate_caption(self, outs, x, query_inds_list):
+        """Caption the decoded boxes of every frame.
 
+        Args:
+            outs (dict): Outputs of `pts_bbox_head`.
+            x (list[Tensor]): Image features.
+            query_inds_list (list[Tensor]): Query of every decoded box of each
+                frame, as returned by ``get_bboxes(..., with_query_inds=True)``,
+                in decreasing score order.
 
+        Returns:
+            list[list]: Caption of every decoded box of each frame, ``None``
+                for the boxes beyond ``caption_budget``.
+        """
         all_bbox_preds = outs['all_bbox_preds'][-1]
-        all_cls_scores = outs['all_cls_scores'][-1]
         bev_embeds = outs['bev_embed']
-
-
         batch_size = len(all_bbox_preds)
 
-
-        caption_outputs = []
-        for bs in range(batch_size):
-            bbox_preds = all_bbox_preds[bs] # 900, 10
-            cls_scores = all_cls_scores[bs] # 900, 10
-
-            bev_embed = bev_embeds[:, bs]
-            bev_embed = bev_embed.unsqueeze(0)
-
-            downsample_proposal = True
-            if downsample_proposal:
-                # TODO: make sure the num_bboxes is the same as bbox coder's
-                # we only evaluate several objects because the huge memory cost of LLM
-                num_bboxes = 64
-
-                cls_scores = cls_scores.sigmoid()
-                scores, indexs = cls_scores.view(-1).topk(num_bboxes)
-                labels = indexs % 10
-                bbox_index = indexs // 10
-                bbox_preds = bbox_preds[bbox_index]
-
-            else:
-                num_bboxes = bbox_preds.size(0)
-
-            
-            # ps_caption_output = []
-            # for object_id in range(num_bboxes):
-            #     single_pred_bbox = bbox_preds[object_id].unsqueeze(0)
-
-            #     with torch.cuda.amp.autocast():
-            #         format_instruction = "Describe the object in detail."
-            #         prompt = llama.format_prompt(format_instruction)
-            #         caption_output = self.llama_adapter.generate((bev_embed, single_pred_bbox), ([prompt]))
-                
-            
-            #     ps_caption_output.append(caption_output)
-
-            # ps_caption_output = []
-
-            # accelerate inference
+        # several decoded boxes can come from one query (one per label), the
+        # query is captioned once; the LLM memory cost limits the boxes per frame
+        proposal_bbox_preds, bev_inds, inverse_list = [], [], []
+        for bs, query_inds in enumerate(query_inds_list):
+            if self.caption_budget is not None:
+                query_inds = query_inds[:self.caption_budget]
+            query_inds, inverse = torch.unique(query_inds, return_inverse=True)
+            proposal_bbox_preds.append(all_bbox_preds[bs][query_inds])
+            bev_inds.append(query_inds.new_full((len(query_inds), ), bs))
+            inverse_list.append(inverse)
+        proposal_bbox_preds = torch.cat(proposal_bbox_preds, dim=0)
+        bev_inds = torch.cat(bev_inds)
+
+        caption_output = []
+        if len(proposal_bbox_preds) > 0:
+            # decode the proposals of every frame in the batch with a single generate call,
+            # the BEV tokens of each frame are projected once and shared by its proposals
             with torch.cuda.amp.autocast():
                 format_instruction = "Describe the object in detail."
                 prompt = llama.format_prompt(format_instruction)
-                ps_caption_output = self.llama_adapter.generate((bev_embed.repeat(num_bboxes, 1, 1), bbox_preds), ([prompt]*num_bboxes))
+                caption_output = self.llama_adapter.generate(
+                    (bev_embeds.permute(1, 0, 2), proposal_bbox_preds),
+                    ([prompt]*len(proposal_bbox_preds)), bev_inds=bev_inds)
 
-            caption_outputs.append(ps_caption_output)
-        print(f"*****************Iter Done: batch size: {batch_size} patch size:{num_bboxes} ******************")
-        # print(ps_caption_output[:3])
+        caption_outputs = []
+        start = 0
+        for query_inds, inverse in zip(query_inds_list, inverse_list):
+            num_queries = int(inverse.max()) + 1 if len(inverse) > 0 else 0
+            frame_captions = caption_output[start:start + num_queries]
+            start += num_queries
+            captions = [frame_captions[i] for i in inverse.tolist()]
+            caption_outputs.append(captions + [None] * (len(query_inds) - len(captions)))
         return caption_outputs
 
 
@@ -384,6 +415,8 @@ class BEVFormer(MVXTwoStageDetector):
     
     def obtain_history_bev(self, imgs_queue, pts, img_metas_list):
         """Obtain history BEV features iteratively. To save GPU memory, gradients are not calculated.
+        Frames in the history BEV cache are not recomputed, the chain restarts
+        from the latest frame cached for every sample of the batch.
         """
         for k in self._modules.keys():
             if k != 'llama_adapter':
@@ -392,6 +425,20 @@ class BEVFormer(MVXTwoStageDetector):
         with torch.no_grad():
             prev_bev = None
             bs, len_queue, num_cams, C, H, W = imgs_queue.shape
+            start = 0
+            for i in reversed(range(len_queue)):
+                cached = self.get_history_bev([each[i] for each in img_metas_list])
+                if cached is not None:
+                    prev_bev, start = cached, i + 1
+                    break
+            if start == len_queue:
+                self.train()
+                return prev_bev
+
+            imgs_queue = imgs_queue[:, start:]
+            if pts is not None:
+                pts = pts[:, start:]
+            len_queue = len_queue - start
             imgs_queue = imgs_queue.reshape(bs*len_queue, num_cams, C, H, W)
             img_feats_list = self.extract_feat(img=imgs_queue, len_queue=len_queue)
             if self.fusion and pts is not None:
@@ -400,7 +447,7 @@ class BEVFormer(MVXTwoStageDetector):
             else:
                 pts_feats_queue = None            
             for i in range(len_queue):
-                img_metas = [each[i] for each in img_metas_list]
+                img_metas = [each[start + i] for each in img_metas_list]
                 if not img_metas[0]['prev_bev_exists']:
                     prev_bev = None
                 # img_feats = self.extract_feat(img=img, img_metas=img_metas)
@@ -416,9 +463,31 @@ class BEVFormer(MVXTwoStageDetector):
                     prev_bev = self.pts_backbone(prev_bev)
                     prev_bev = self.pts_neck(prev_bev)
                     prev_bev = prev_bev[0].reshape(bs, pts_feats.shape[1], -1).permute(0, 2, 1)
+                self.put_history_bev(img_metas, prev_bev)
             self.train()
             return prev_bev
 
+    def get_history_bev(self, img_metas):
+        """(bs, bev_h*bev_w, embed_dims) cached BEV of the frames of `img_metas`, None unless all are cached."""
+        if self.history_bev_cache_size <= 0:
+            return None
+        tokens = [img_meta['sample_idx'] for img_meta in img_metas]
+        if not all(token in self.history_bev_cache for token in tokens):
+            return None
+        for token in tokens:
+            self.history_bev_cache.move_to_end(token)
+        return torch.stack([self.history_bev_cache[token] for token in tokens])
+
+    def put_history_bev(self, img_metas, bev):
+        """Cache the (bs, bev_h*bev_w, embed_dims) BEV of the frames of `img_metas`."""
+        if self.history_bev_cache_size <= 0:
+            return
+        for i, img_meta in enumerate(img_metas):
+            self.history_bev_cache[img_meta['sample_idx']] = bev[i].detach()
+            self.history_bev_cache.move_to_end(img_meta['sample_idx'])
+        while len(self.history_bev_cache) > self.history_bev_cache_size:
+            self.history_bev_cache.popitem(last=False)
+
     @auto_fp16(apply_to=('img', 'points'))
     def forward_train(self,
                       points=None,
@@ -435,6 +504,9 @@ class BEVFormer(MVXTwoStageDetector):
                       gt_captions_3d=None,
                       gt_caplabels_3d=None,
                       gt_capmask_3d=None,
+                      cached_bev_embed=None,
+                      cached_bbox_preds=None,
+                      cached_assigned_gt=None,
                       **kwargs
                       ):
         """Forward training function.
@@ -457,10 +529,21 @@ class BEVFormer(MVXTwoStageDetector):
                 used for training Fast RCNN. Defaults to None.
             gt_bboxes_ignore (list[torch.Tensor], optional): Ground truth
                 2D boxes in images to be ignored. Defaults to None.
+            cached_bev_embed (torch.Tensor, optional): Precomputed BEV
+                features (B, bev_h*bev_w, C) from a BEV feature cache. When
+                given, the images are not used and the encoder and detection
+                head are skipped.
+            cached_bbox_preds (torch.Tensor, optional): Precomputed last
+                decoder layer boxes (B, num_query, code_size).
+            cached_assigned_gt (torch.Tensor, optional): Precomputed
+                assigned gt index of each query (B, num_query), -1 if none.
         Returns:
             dict: Losses of different branches.
         """
-        
+        if cached_bev_embed is not None:
+            return self.forward_cached_train(cached_bev_embed, cached_bbox_preds, cached_assigned_gt,
+                                             gt_captions_3d, gt_caplabels_3d)
+
         # do not freeze the bev encoder
         len_queue = img.size(1)
         prev_img = img[:, :-1, ...]
@@ -496,6 +579,70 @@ class BEVFormer(MVXTwoStageDetector):
         losses.update(losses_pts)
         return losses
 
+    def forward_cached_train(self, bev_embed, bbox_preds, assigned_gt, gt_captions_3d, gt_caplabels_3d):
+        """Caption loss from the frozen encoder outputs stored in a BEV feature cache."""
+        assert self.training_stage == 2, \
+            'the encoder and detection head get no loss from a BEV feature cache, use training_stage=2'
+        outs = {
+            'bev_embed': bev_embed.permute(1, 0, 2),
+            'all_bbox_preds': [bbox_preds],
+        }
+        sampling_results = []
+        for assigned in assigned_gt:
+            pos_inds = torch.nonzero(assigned >= 0, as_tuple=False).squeeze(-1)
+            sampling_results.append(SimpleNamespace(
+                pos_inds=pos_inds, pos_assigned_gt_inds=assigned[pos_inds]))
+
+        caploss = self.caption_head(outs, None, sampling_results, gt_captions_3d, gt_caplabels_3d)
+        return {"loss_cap": caploss}
+
+    @torch.no_grad()
+    def precompute_bev_cache(self,
+                             img_metas=None,
+                             gt_bboxes_3d=None,
+                             gt_labels_3d=None,
+                             img=None,
+                             **kwargs):
+        """Run the encoder and detection head part of `forward_train` and return its per-sample outputs.
+
+        Returns:
+            list[dict]: For each sample, its token and the arrays written to a
+                :obj:`BEVFeatureStore`: `bev_embed` (float16), `bbox_preds` and
+                `assigned_gt` (-1 for queries without a gt box).
+        """
+        assert not self.fusion, 'the BEV feature cache is written for the camera-only model'
+        len_queue = img.size(1)
+        prev_img = img[:, :-1, ...]
+        img = img[:, -1, ...]
+
+        prev_img_metas = copy.deepcopy(img_metas)
+        prev_bev = self.obtain_history_bev(prev_img, None, prev_img_metas)
+
+        img_metas = [each[len_queue-1] for each in img_metas]
+        if not img_metas[0]['prev_bev_exists']:
+            prev_bev = None
+
+        self.eval()
+        img_feats = self.extract_feat(img=img, img_metas=img_metas)
+        outs = self.pts_bbox_head(img_feats, None, img_metas, prev_bev)
+        self.put_history_bev(img_metas, outs['bev_embed'].permute(1, 0, 2))
+        _, sampling_results = self.pts_bbox_head.loss(gt_bboxes_3d, gt_labels_3d, outs, img_metas=img_metas)
+        sampling_results = sampling_results[-1]
+
+        bev_embeds = outs['bev_embed'].permute(1, 0, 2).half().cpu().numpy()
+        all_bbox_preds = outs['all_bbox_preds'][-1].float().cpu().numpy()
+        results = []
+        for bs, sampling_result in enumerate(sampling_results):
+            assigned_gt = np.full((all_bbox_preds.shape[1], ), -1, dtype=np.int16)
+            assigned_gt[sampling_result.pos_inds.cpu().numpy()] = \
+                sampling_result.pos_assigned_gt_inds.cpu().numpy()
+            results.append(dict(
+                token=img_metas[bs]['sample_idx'],
+                bev_embed=bev_embeds[bs],
+                bbox_preds=all_bbox_preds[bs],
+                assigned_gt=assigned_gt))
+        return results
+
     def forward_test(self, img_metas, img=None, points=None, **kwargs):
         for var, name in [(img_metas, 'img_metas')]:
             if not isinstance(var, list):
@@ -503,34 +650,84 @@ class BEVFormer(MVXTwoStageDetector):
                     name, type(var)))
         img = [img] if img is None else img
         pts = [points] if points is None else points
+        img_metas, img, pts = img_metas[0], img[0], pts[0]
+
+        # every row of the batch gets the history of its own scene; rows of the
+        # same scene run one after another, rows with and without a previous
+        # BEV separately, the rest as one batch
+        bbox_results = [None] * len(img_metas)
+        for rows in self.temporal_groups(img_metas):
+            prev_infos = [self.prev_frame_infos.get(img_metas[i]['scene_token']) for i in rows]
+            prev_bev = None
+            if prev_infos[0] is not None:
+                prev_bev = torch.stack([info['prev_bev'] for info in prev_infos], dim=1)
+
+            # Get the delta of ego position and angle between two timestamps.
+            tmp_poses, tmp_angles = [], []
+            for i, prev_info in zip(rows, prev_infos):
+                tmp_poses.append(copy.deepcopy(img_metas[i]['can_bus'][:3]))
+                tmp_angles.append(copy.deepcopy(img_metas[i]['can_bus'][-1]))
+                if prev_info is not None:
+                    img_metas[i]['can_bus'][:3] -= prev_info['prev_pos']
+                    img_metas[i]['can_bus'][-1] -= prev_info['prev_angle']
+                else:
+                    img_metas[i]['can_bus'][-1] = 0
+                    img_metas[i]['can_bus'][:3] = 0
+
+            new_prev_bev, group_results = self.simple_test(
+                [img_metas[i] for i in rows], self._select_rows(img, rows), self._select_rows(pts, rows),
+                prev_bev=prev_bev, **kwargs)
+            # During inference, we save the BEV features and ego motion of each timestamp.
+            for j, i in enumerate(rows):
+                bbox_results[i] = group_results[j]
+                if self.video_test_mode:
+                    scene_token = img_metas[i]['scene_token']
+                    self.prev_frame_infos[scene_token] = {
+                        'prev_bev': new_prev_bev[:, j],
+                        'prev_pos': tmp_poses[j],
+                        'prev_angle': tmp_angles[j],
+                    }
+                    self.prev_frame_infos.move_to_end(scene_token)
+            while len(self.prev_frame_infos) > self.max_test_scenes:
+                self.prev_frame_infos.popitem(last=False)
+        return bbox_results
 
-        if img_metas[0][0]['scene_token'] != self.prev_frame_info['scene_token']:
-            # the first sample of each scene is truncated
-            self.prev_frame_info['prev_bev'] = None
-        # update idx
-        self.prev_frame_info['scene_token'] = img_metas[0][0]['scene_token']
+    def temporal_groups(self, img_metas):
+        """Split the rows of a test batch into groups run by one `simple_test`.
 
-        # do not use temporal information
+        A group holds at most one frame per scene, frames of a scene keep their
+        order, and either all or none of its rows have a previous BEV.
+        """
         if not self.video_test_mode:
-            self.prev_frame_info['prev_bev'] = None
-
-        # Get the delta of ego position and angle between two timestamps.
-        tmp_pos = copy.deepcopy(img_metas[0][0]['can_bus'][:3])
-        tmp_angle = copy.deepcopy(img_metas[0][0]['can_bus'][-1])
-        if self.prev_frame_info['prev_bev'] is not None:
-            img_metas[0][0]['can_bus'][:3] -= self.prev_frame_info['prev_pos']
-            img_metas[0][0]['can_bus'][-1] -= self.prev_frame_info['prev_angle']
-        else:
-            img_metas[0][0]['can_bus'][-1] = 0
-            img_metas[0][0]['can_bus'][:3] = 0
-
-        new_prev_bev, bbox_results = self.simple_test(
-            img_metas[0], img[0], pts[0], prev_bev=self.prev_frame_info['prev_bev'], **kwargs)
-        # During inference, we save the BEV features and ego motion of each timestamp.
-        self.prev_frame_info['prev_pos'] = tmp_pos
-        self.prev_frame_info['prev_angle'] = tmp_angle
-        self.prev_frame_info['prev_bev'] = new_prev_bev
-        return bbox_results
+            return [list(range(len(img_metas)))]
+
+        groups = []
+        # rows that come after a frame of the same scene still in flight
+        pending = list(range(len(img_metas)))
+        seen = set(self.prev_frame_infos.keys())
+        while pending:
+            wave, rest, wave_scenes = [], [], set()
+            for i in pending:
+                scene_token = img_metas[i]['scene_token']
+                if scene_token in wave_scenes:
+                    rest.append(i)
+                else:
+                    wave.append(i)
+                    wave_scenes.add(scene_token)
+            with_prev = [i for i in wave if img_metas[i]['scene_token'] in seen]
+            without_prev = [i for i in wave if img_metas[i]['scene_token'] not in seen]
+            groups.extend(rows for rows in (with_prev, without_prev) if len(rows) > 0)
+            seen |= wave_scenes
+            pending = rest
+        return groups
+
+    @staticmethod
+    def _select_rows(x, rows):
+        if x is None:
+            return None
+        if isinstance(x, torch.Tensor):
+            return x[rows]
+        return [x[i] for i in rows]
 
     def simple_test_pts(self, x, pts_feats,  img_metas, prev_bev=None, rescale=False):
         """Test function"""
@@ -543,16 +740,18 @@ class BEVFormer(MVXTwoStageDetector):
             fused_bev = self.pts_neck(fused_bev)
             outs['bev_embed'] = fused_bev[0].reshape(pts_feats.shape[0], pts_feats.shape[1], -1).permute(2, 0, 1)
         bbox_list = self.pts_bbox_head.get_bboxes(
-            outs, img_metas, rescale=rescale)
-        
+            outs, img_metas, rescale=rescale, with_query_inds=True)
+
+        # only the decoded boxes are captioned, so caps_3d lines up with boxes_3d
         if self.training_stage != 1:
-            caption_results = self.generate_caption(outs, x)
+            caption_results = self.generate_caption(
+                outs, x, [query_inds for _, _, _, query_inds in bbox_list])
         else:
-            caption_results = [None]
+            caption_results = [None] * len(bbox_list)
 
         bbox_results = [
             bbox3d2result(bboxes, scores, labels, caps=captions)
-            for (bboxes, scores, labels), captions in zip(bbox_list, caption_results)
+            for (bboxes, scores, labels, _), captions in zip(bbox_list, caption_results)
         ]
 
         return outs['bev_embed'], bbox_results
@@ -277,14 +277,16 @@ class BEVFormer(MVXTwoStageDetector):
             sampled_indices = _downsamplecap(num_total_pos, 2)
 
             bbox_preds = bbox_preds[pos_inds[sampled_indices]]
-            bev_embed = bev_embed.unsqueeze(0).repeat(2, 1, 1)
+            # the BEV tokens are projected once and shared by the sampled boxes
+            bev_embed = bev_embed.unsqueeze(0)
+            bev_inds = bev_embed.new_zeros((2,), dtype=torch.long)
 
             caption_targets = gt_captions[sampling_result.pos_assigned_gt_inds[sampled_indices]]
             caplabel_targets = gt_caplabels[sampling_result.pos_assigned_gt_inds[sampled_indices]]
             caption_weights = caption_targets.new_ones((2,), dtype=torch.long)
 
             with torch.cuda.amp.autocast():
-                caption_loss = self.llama_adapter((caption_targets, caplabel_targets, caption_weights), (bev_embed, bbox_preds))
+                caption_loss = self.llama_adapter((caption_targets, caplabel_targets, caption_weights), (bev_embed, bbox_preds), bev_inds)
 
             loss.append(caption_loss)
 
@@ -302,13 +304,10 @@ class BEVFormer(MVXTwoStageDetector):
         batch_size = len(all_bbox_preds)
 
 
-        caption_outputs = []
+        proposal_bbox_preds = []
         for bs in range(batch_size):
-            bbox_preds = all_bbox_preds[bs]
-            cls_scores = all_cls_scores[bs]
-
-            bev_embed = bev_embeds[:, bs]
-            bev_embed = bev_embed.unsqueeze(0)
+            bbox_preds = all_bbox_preds[bs] # 900, 10
+            cls_scores = all_cls_scores[bs] # 900, 10
 
             downsample_proposal = True
             if downsample_proposal:
@@ -325,23 +324,19 @@ class BEVFormer(MVXTwoStageDetector):
             else:
                 num_bboxes = bbox_preds.size(0)
 
-            
-            ps_caption_output = []
-            for object_id in range(num_bboxes):
-                single_pred_bbox = bbox_preds[object_id].unsqueeze(0)
-
-                with torch.cuda.amp.autocast():
-                    format_instruction = "Describe the object in detail."
-                    prompt = llama.format_prompt(format_instruction)
-                    caption_output = self.llama_adapter.generate((bev_embed, single_pred_bbox), ([prompt]))
-                
-            
-                ps_caption_output.append(caption_output)
+            proposal_bbox_preds.append(bbox_preds)
 
-                print(caption_output)
-                
-                # break
-            caption_outputs.append(ps_caption_output)
+        # decode the proposals of every frame in the batch with a single generate call,
+        # the BEV tokens of each frame are projected once and shared by its proposals
+        bev_inds = torch.arange(batch_size, device=bev_embeds.device).repeat_interleave(num_bboxes)
+        with torch.cuda.amp.autocast():
+            format_instruction = "Describe the object in detail."
+            prompt = llama.format_prompt(format_instruction)
+            caption_output = self.llama_adapter.generate(
+                (bev_embeds.permute(1, 0, 2), torch.cat(proposal_bbox_preds, dim=0)),
+                ([prompt]*num_bboxes*batch_size), bev_inds=bev_inds)
+
+        caption_outputs = [caption_output[bs*num_bboxes:(bs+1)*num_bboxes] for bs in range(batch_size)]
         print(f"*****************Iter Done: batch size: {batch_size} patch size:{num_bboxes} ******************")
         return caption_outputs
 
@@ -42,6 +42,8 @@ class BEVFormerEncoder(TransformerLayerSequence):
         self.num_points_in_pillar = num_points_in_pillar
         self.pc_range = pc_range
         self.fp16_enabled = False
+        # reference point grids of `get_reference_points`, by their arguments
+        self.reference_points_cache = {}
 
     @staticmethod
     def get_reference_points(H, W, Z=8, num_points_in_pillar=4, dim='3d', bs=1, device='cuda', dtype=torch.float):
@@ -84,11 +86,24 @@ class BEVFormerEncoder(TransformerLayerSequence):
             ref_2d = ref_2d.repeat(bs, 1, 1).unsqueeze(2)
             return ref_2d
 
+    def cached_reference_points(self, H, W, Z=8, num_points_in_pillar=4, dim='3d', bs=1, device='cuda',
+                                dtype=torch.float):
+        """`get_reference_points`, built once per grid shape, batch size,
+        device and dtype. The returned tensor is shared between calls and
+        must not be modified in place.
+        """
+        key = (H, W, Z, num_points_in_pillar, dim, bs, str(device), dtype)
+        if key not in self.reference_points_cache:
+            self.reference_points_cache[key] = self.get_reference_points(
+                H, W, Z, num_points_in_pillar, dim=dim, bs=bs, device=device, dtype=dtype)
+        return self.reference_points_cache[key]
+
     # This function must use fp32!!!
     @force_fp32(apply_to=('reference_points', 'img_metas'))
     def point_sampling(self, reference_points, pc_range,  img_metas):
         # NOTE: close tf32 here.
         allow_tf32 = torch.backends.cuda.matmul.allow_tf32
+        allow_cudnn_tf32 = torch.backends.cudnn.allow_tf32
         torch.backends.cuda.matmul.allow_tf32 = False
         torch.backends.cudnn.allow_tf32 = False
 
@@ -144,7 +159,7 @@ class BEVFormerEncoder(TransformerLayerSequence):
         bev_mask = bev_mask.permute(2, 1, 3, 0, 4).squeeze(-1)
 
         torch.backends.cuda.matmul.allow_tf32 = allow_tf32
-        torch.backends.cudnn.allow_tf32 = allow_tf32
+        torch.backends.cudnn.allow_tf32 = allow_cudnn_tf32
 
         return reference_points_cam, bev_mask
 
@@ -185,9 +200,9 @@ class BEVFormerEncoder(TransformerLayerSequence):
         output = bev_query
         intermediate = []
 
-        ref_3d = self.get_reference_points(
+        ref_3d = self.cached_reference_points(
             bev_h, bev_w, self.pc_range[5]-self.pc_range[2], self.num_points_in_pillar, dim='3d', bs=bev_query.size(1),  device=bev_query.device, dtype=bev_query.dtype)
-        ref_2d = self.get_reference_points(
+        ref_2d = self.cached_reference_points(
             bev_h, bev_w, dim='2d', bs=bev_query.size(1), device=bev_query.device, dtype=bev_query.dtype)
 
         reference_points_cam, bev_mask = self.point_sampling(
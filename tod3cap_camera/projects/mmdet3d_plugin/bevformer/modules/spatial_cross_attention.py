@@ -71,6 +71,32 @@ class SpatialCrossAttention(BaseModule):
     def init_weight(self):
         """Default initialization for Parameters of Module."""
         xavier_init(self.output_proj, distribution='uniform', bias=0.)
+
+    @staticmethod
+    def rebatch_indices(bev_mask):
+        """Flat indices moving the BEV queries hit by each camera into a dense batch.
+
+        Args:
+            bev_mask (Tensor): (num_cams, bs, num_query, D) visibility of the
+                pillar points of every BEV query in every camera.
+        Returns:
+            tuple: `query_index` into (bs * num_query) queries, `cam_query_index`
+                into (bs * num_cams * num_query) per-camera queries, `rebatch_index`
+                into (bs * num_cams * max_len) rebatched queries, all of the same
+                length, and `max_len`, the largest number of queries of a camera.
+        """
+        num_cams, bs, num_query, _ = bev_mask.shape
+        # (bs * num_cams, num_query), rows ordered as (sample, camera)
+        mask = (bev_mask.sum(-1) > 0).permute(1, 0, 2).reshape(bs * num_cams, num_query)
+        # position of every visible query among the visible queries of its camera
+        position = mask.cumsum(-1) - 1
+        cam_query_index = mask.flatten().nonzero().squeeze(-1)
+        max_len = int(position[:, -1].max()) + 1 if cam_query_index.numel() > 0 else 0
+        row = cam_query_index // num_query
+        query = cam_query_index % num_query
+        query_index = (row // num_cams) * num_query + query
+        rebatch_index = row * max_len + position.flatten()[cam_query_index]
+        return query_index, cam_query_index, rebatch_index, max_len
     
     @force_fp32(apply_to=('query', 'key', 'value', 'query_pos', 'reference_points_cam'))
     def forward(self,
@@ -134,23 +160,19 @@ class SpatialCrossAttention(BaseModule):
         bs, num_query, _ = query.size()
 
         D = reference_points_cam.size(3)
-        indexes = []
-        for i, mask_per_img in enumerate(bev_mask):
-            index_query_per_img = mask_per_img[0].sum(-1).nonzero().squeeze(-1)
-            indexes.append(index_query_per_img)
-        max_len = max([len(each) for each in indexes])
+        query_index, cam_query_index, rebatch_index, max_len = self.rebatch_indices(bev_mask)
 
         # each camera only interacts with its corresponding BEV queries. This step can  greatly save GPU memory.
         queries_rebatch = query.new_zeros(
-            [bs, self.num_cams, max_len, self.embed_dims])
+            [bs * self.num_cams * max_len, self.embed_dims])
+        queries_rebatch.index_copy_(
+            0, rebatch_index, query.reshape(bs * num_query, self.embed_dims).index_select(0, query_index))
         reference_points_rebatch = reference_points_cam.new_zeros(
-            [bs, self.num_cams, max_len, D, 2])
-        
-        for j in range(bs):
-            for i, reference_points_per_img in enumerate(reference_points_cam):   
-                index_query_per_img = indexes[i]
-                queries_rebatch[j, i, :len(index_query_per_img)] = query[j, index_query_per_img]
-                reference_points_rebatch[j, i, :len(index_query_per_img)] = reference_points_per_img[j, index_query_per_img]
+            [bs * self.num_cams * max_len, D, 2])
+        reference_points_rebatch.index_copy_(
+            0, rebatch_index,
+            reference_points_cam.transpose(0, 1).reshape(bs * self.num_cams * num_query, D, 2).index_select(
+                0, cam_query_index))
 
         num_cams, l, bs, embed_dims = key.shape
 
@@ -161,10 +183,9 @@ class SpatialCrossAttention(BaseModule):
 
         queries = self.deformable_attention(query=queries_rebatch.view(bs*self.num_cams, max_len, self.embed_dims), key=key, value=value,
                                             reference_points=reference_points_rebatch.view(bs*self.num_cams, max_len, D, 2), spatial_shapes=spatial_shapes,
-                                            level_start_index=level_start_index).view(bs, self.num_cams, max_len, self.embed_dims)
-        for j in range(bs):
-            for i, index_query_per_img in enumerate(indexes):
-                slots[j, index_query_per_img] += queries[j, i, :len(index_query_per_img)]
+                                            level_start_index=level_start_index).view(bs * self.num_cams * max_len, self.embed_dims)
+        slots = slots.reshape(bs * num_query, self.embed_dims).index_add(
+            0, query_index, queries.index_select(0, rebatch_index)).view(bs, num_query, self.embed_dims)
 
         count = bev_mask.sum(-1) > 0
         count = count.permute(1, 2, 0).sum(-1)
@@ -1,3 +1,5 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import torch
 
 from mmdet.core.bbox.builder import BBOX_ASSIGNERS
@@ -37,17 +39,30 @@ class HungarianAssigner3D(BaseAssigner):
         iou_mode (str | optional): "iou" (intersection over union), "iof"
                 (intersection over foreground), or "giou" (generalized
                 intersection over union). Default "giou".
+        solver (str, optional): Matching solver of `assign_batch`, "scipy"
+            (exact, on CPU) or "auction" (`auction_assignment` on the device
+            of the predictions, optimal up to a small tolerance, the samples
+            whose auction does not finish are solved with scipy).
+            Default "scipy".
+        num_threads (int, optional): Number of threads solving the samples
+            of a batch with scipy. Default 4.
     """
 
     def __init__(self,
                  cls_cost=dict(type='ClassificationCost', weight=1.),
                  reg_cost=dict(type='BBoxL1Cost', weight=1.0),
                  iou_cost=dict(type='IoUCost', weight=0.0),
-                 pc_range=None):
+                 pc_range=None,
+                 solver='scipy',
+                 num_threads=4):
+        assert solver in ('scipy', 'auction'), f'unknown solver {solver}'
         self.cls_cost = build_match_cost(cls_cost)
         self.reg_cost = build_match_cost(reg_cost)
         self.iou_cost = build_match_cost(iou_cost)
         self.pc_range = pc_range
+        self.solver = solver
+        self.num_threads = num_threads
+        self._pool = None
 
     def assign(self,
                bbox_pred,
@@ -133,4 +148,189 @@ class HungarianAssigner3D(BaseAssigner):
         assigned_gt_inds[matched_row_inds] = matched_col_inds + 1
         assigned_labels[matched_row_inds] = gt_labels[matched_col_inds]
         return AssignResult(
-            num_gts, assigned_gt_inds, None, labels=assigned_labels)
\ No newline at end of file
+            num_gts, assigned_gt_inds, None, labels=assigned_labels)
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.num_threads)
+        return self._pool
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_pool'] = None
+        return state
+
+    def assign_batch(self,
+                     bbox_preds,
+                     cls_preds,
+                     gt_bboxes_list,
+                     gt_labels_list,
+                     gt_bboxes_ignore_list=None):
+        """Matching of all the samples of a batch, same results as `assign`.
+
+        The costs of every query against the boxes of every sample are
+        computed in one call of the match costs, as a (bs, num_query,
+        num_total_gt) tensor, so the cost of sample i is the block of its own
+        boxes. With the scipy solver the tensor is copied to CPU once and the
+        blocks are solved on a thread pool. With the auction solver the blocks
+        are padded to the largest one and solved together on the device, the
+        ones whose auction does not finish go to scipy.
+
+        Args:
+            bbox_preds (Tensor): Predicted boxes, shape [bs, num_query, code_size].
+            cls_preds (Tensor): Predicted classification logits, shape
+                [bs, num_query, num_class].
+            gt_bboxes_list (list[Tensor]): Ground truth boxes of each sample.
+            gt_labels_list (list[Tensor]): Labels of `gt_bboxes_list`.
+            gt_bboxes_ignore_list (list, optional): Only None is supported.
+
+        Returns:
+            list[:obj:`AssignResult`]: The assigned results of the samples.
+        """
+        assert gt_bboxes_ignore_list is None or \
+            all(ignore is None for ignore in gt_bboxes_ignore_list), \
+            'Only case when gt_bboxes_ignore is None is supported.'
+        bs, num_bboxes = bbox_preds.shape[:2]
+        num_gts = [gt_bboxes.size(0) for gt_bboxes in gt_bboxes_list]
+        offsets = [0]
+        for num_gt in num_gts:
+            offsets.append(offsets[-1] + num_gt)
+
+        matches = [None] * bs
+        if offsets[-1] > 0 and num_bboxes > 0:
+            gt_labels = torch.cat(gt_labels_list)
+            normalized_gt_bboxes = normalize_bbox(torch.cat(gt_bboxes_list), self.pc_range)
+            cls_cost = self.cls_cost(cls_preds.flatten(0, 1), gt_labels)
+            reg_cost = self.reg_cost(bbox_preds.flatten(0, 1)[:, :8], normalized_gt_bboxes[:, :8])
+            cost = (cls_cost + reg_cost).detach().view(bs, num_bboxes, -1)
+            blocks = [i for i in range(bs) if num_gts[i] > 0]
+
+            # the auction needs at least as many queries as gts
+            auction_gts = [num_gt if num_gt <= num_bboxes else 0 for num_gt in num_gts]
+            if self.solver == 'auction' and max(auction_gts) > 0:
+                num_gt = max(auction_gts)
+                cols = torch.arange(num_gt, device=cost.device)
+                col_inds = (cost.new_tensor(offsets[:-1], dtype=torch.long)[:, None] + cols).clamp(
+                    max=offsets[-1] - 1)
+                padded = cost.gather(2, col_inds[:, None, :].expand(bs, num_bboxes, num_gt))
+                assigned, finished = auction_assignment(padded, auction_gts)
+                finished = finished.tolist()
+                for i in blocks:
+                    if auction_gts[i] > 0 and finished[i]:
+                        matches[i] = (assigned[i, :num_gts[i]], cols[:num_gts[i]])
+                blocks = [i for i in blocks if matches[i] is None]
+
+            if len(blocks) > 0:
+                if linear_sum_assignment is None:
+                    raise ImportError('Please run "pip install scipy" '
+                                      'to install scipy first.')
+                cost = cost.cpu().numpy()
+                solved = self.pool.map(
+                    lambda i: linear_sum_assignment(cost[i, :, offsets[i]:offsets[i + 1]]), blocks)
+                for i, (row_inds, col_inds) in zip(blocks, solved):
+                    matches[i] = (torch.from_numpy(row_inds).to(bbox_preds.device),
+                                  torch.from_numpy(col_inds).to(bbox_preds.device))
+
+        assign_results = []
+        for i in range(bs):
+            assigned_gt_inds = bbox_preds.new_full((num_bboxes, ), 0, dtype=torch.long)
+            assigned_labels = bbox_preds.new_full((num_bboxes, ), -1, dtype=torch.long)
+            if num_gts[i] > 0 and num_bboxes == 0:
+                assigned_gt_inds[:] = -1
+            if matches[i] is not None:
+                matched_row_inds, matched_col_inds = matches[i]
+                assigned_gt_inds[matched_row_inds] = matched_col_inds + 1
+                assigned_labels[matched_row_inds] = gt_labels_list[i][matched_col_inds]
+            assign_results.append(AssignResult(
+                num_gts[i], assigned_gt_inds, None, labels=assigned_labels))
+        return assign_results
+
+
+def auction_assignment(cost, num_gts=None, rel_eps=1e-3, max_iter=1000, check_every=8):
+    """Minimum cost matching of the columns of cost matrices to distinct rows, in PyTorch.
+
+    Bertsekas' forward auction algorithm, the columns (gts) bidding for the
+    rows (queries) of all the matrices of the batch at once, on the device
+    of `cost`. The host only checks every ``check_every`` bidding rounds
+    whether the bidding is over.
+
+    All rows start at the same price and the rows nobody bid for keep it, so
+    on these rectangular matrices a finished auction is within ``num_gt *
+    eps`` of the optimum of `linear_sum_assignment`, with the bid increment
+    ``eps = rel_eps * cost range / num_gt``. There is no epsilon scaling,
+    which would need reverse bidding to keep that bound on rectangular
+    matrices; with many more queries than gts, the bids jump by the gap
+    between the two best rows and the auction ends in a few rounds.
+
+    Args:
+        cost (Tensor): Cost matrices of shape (bs, num_query, num_gt), or one
+            matrix of shape (num_query, num_gt), num_query >= num_gt.
+        num_gts (list[int], optional): Number of valid columns of each
+            matrix, the others are padding. Defaults to all the columns.
+        rel_eps (float): Bid increment, relative to the cost range divided by
+            the number of columns. Default 1e-3.
+        max_iter (int): Maximum number of bidding rounds. Default 1000.
+        check_every (int): Number of bidding rounds between two checks of
+            the end of the bidding. Default 8.
+
+    Returns:
+        tuple[Tensor]: The row matched to each column, shape (bs, num_gt), -1
+            for padding columns, and whether the bidding of each matrix
+            finished within ``max_iter`` rounds, shape (bs, ). Unfinished
+            matchings are partial and should be solved exactly. Without batch
+            dimension for one matrix.
+    """
+    single = cost.dim() == 2
+    if single:
+        cost = cost[None]
+    bs, num_query, num_gt = cost.shape
+    assert num_query >= num_gt, 'the auction needs at least as many rows as columns'
+    if num_gts is None:
+        num_gts = [num_gt] * bs
+    device = cost.device
+    valid = torch.arange(num_gt, device=device) < cost.new_tensor(num_gts, dtype=torch.long)[:, None]
+
+    benefit = -cost.transpose(1, 2)
+    if benefit.dtype != torch.float64:
+        benefit = benefit.float()
+    benefit = benefit.masked_fill(~valid[..., None], 0)
+    high = benefit.masked_fill(~valid[..., None], float('-inf')).flatten(1).max(1)[0]
+    low = benefit.masked_fill(~valid[..., None], float('inf')).flatten(1).min(1)[0]
+    cost_range = torch.where(valid.any(1), high - low, torch.zeros_like(high)) + 1e-6
+    eps = cost_range / valid.sum(1).clamp(min=1) * rel_eps
+
+    query_inds = torch.arange(num_query, device=device).expand(bs, num_query)
+    prices = benefit.new_zeros(bs, num_query)
+    owner = cost.new_full((bs, num_query), -1, dtype=torch.long)
+    # the row of each column, the extra column collects the updates of unowned rows
+    assigned = cost.new_full((bs, num_gt + 1), -1, dtype=torch.long)
+    for i in range(max_iter):
+        bidding = valid & (assigned[:, :num_gt] < 0)
+        if i % check_every == 0 and not bool(bidding.any()):
+            break
+        values = benefit - prices[:, None, :]
+        if num_query > 1:
+            top_values, top_inds = values.topk(2, dim=2)
+            gaps = top_values[..., 0] - top_values[..., 1]
+        else:
+            top_inds = values.new_zeros(values.shape, dtype=torch.long)
+            gaps = values.new_zeros((bs, num_gt))
+        best = top_inds[..., 0]
+        bids = (prices.gather(1, best) + gaps + eps[:, None]).masked_fill(~bidding, float('-inf'))
+
+        # the highest bid wins every row that received bids
+        bid_matrix = torch.full_like(values, float('-inf'))
+        bid_matrix.scatter_(2, best[..., None], bids[..., None])
+        max_bids, winners = bid_matrix.max(dim=1)
+        won = torch.isfinite(max_bids)
+        assigned.scatter_(1, torch.where(won & (owner >= 0), owner, num_gt), -1)
+        owner = torch.where(won, winners, owner)
+        assigned.scatter_(1, torch.where(won, winners, num_gt), query_inds)
+        prices = torch.where(won, max_bids, prices)
+
+    assigned = assigned[:, :num_gt]
+    finished = ~(valid & (assigned < 0)).any(1)
+    if single:
+        return assigned[0], finished[0]
+    return assigned, finished
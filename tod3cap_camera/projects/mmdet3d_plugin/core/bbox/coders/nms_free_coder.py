@@ -47,7 +47,8 @@ class NMSFreeCoder(BaseBBoxCoder):
                 head with normalized coordinate format (cx, cy, w, l, cz, h, rot_sine, rot_cosine, vx, vy). \
                 Shape [num_query, 9].
         Returns:
-            list[dict]: Decoded boxes.
+            dict: Decoded boxes, with the query of every box in
+                ``query_inds``, in decreasing score order.
         """
         max_num = self.max_num
 
@@ -90,7 +91,8 @@ class NMSFreeCoder(BaseBBoxCoder):
             predictions_dict = {
                 'bboxes': boxes3d,
                 'scores': scores,
-                'labels': labels
+                'labels': labels,
+                'query_inds': bbox_index[mask]
             }
 
         else:
@@ -1,8 +1,10 @@
 from .nuscenes_dataset import CustomNuScenesDataset
 from .nuscenes_dataset_v2 import CustomNuScenesDatasetV2
+from .nuscenes_columnar_dataset import CustomNuScenesColumnarDataset
 
 from .builder import custom_build_dataset
 __all__ = [
     'CustomNuScenesDataset',
     'CustomNuScenesDatasetV2',
+    'CustomNuScenesColumnarDataset',
 ]
@@ -0,0 +1,118 @@
+import json
+from os import path as osp
+
+import mmcv
+import numpy as np
+
+
+class BEVFeatureStore(object):
+    """Memory-mapped store of the frozen BEVFormer outputs used by stage-3 caption training.
+
+    With the encoder and the detection head frozen, `bev_embed`, the last decoder
+    layer boxes and the Hungarian assignment of a sample are the same every epoch.
+    They are written once by `tools/precompute_bev_cache.py` and read back by
+    `CustomNuScenesDataset` (``bev_cache_root``), so caption training skips the
+    image backbone entirely.
+
+    Layout of ``root``::
+
+        index.json       sample tokens in row order and the array shapes
+        bev_embed.npy    (num_samples, bev_h * bev_w, embed_dims) float16
+        bbox_preds.npy   (num_samples, num_query, code_size) float32
+        assigned_gt.npy  (num_samples, num_query) int16, -1 for unassigned queries
+        written.npy      (num_samples,) uint8, whether the row has been filled
+
+    Args:
+        root (str): Directory of the store.
+        mode (str): Memory-map mode of the arrays, 'r' to read and 'r+' to write.
+    """
+
+    ARRAYS = ('bev_embed', 'bbox_preds', 'assigned_gt', 'written')
+
+    def __init__(self, root, mode='r'):
+        self.root = root
+        self.mode = mode
+        index = mmcv.load(osp.join(root, 'index.json'))
+        self.tokens = index['tokens']
+        self.token2row = {token: row for row, token in enumerate(self.tokens)}
+        self._arrays = None
+
+    @classmethod
+    def create(cls, root, tokens, bev_shape, bbox_shape):
+        """Allocate an empty store for `tokens`.
+
+        Args:
+            root (str): Directory of the store.
+            tokens (list[str]): Sample tokens, one row each.
+            bev_shape (tuple[int]): Shape of one `bev_embed`, (bev_h * bev_w, embed_dims).
+            bbox_shape (tuple[int]): Shape of one `bbox_preds`, (num_query, code_size).
+        """
+        mmcv.mkdir_or_exist(root)
+        num_samples = len(tokens)
+        shapes = dict(
+            bev_embed=((num_samples, *bev_shape), np.float16),
+            bbox_preds=((num_samples, *bbox_shape), np.float32),
+            assigned_gt=((num_samples, bbox_shape[0]), np.int16),
+            written=((num_samples, ), np.uint8))
+        for name, (shape, dtype) in shapes.items():
+            array = np.lib.format.open_memmap(
+                osp.join(root, f'{name}.npy'), mode='w+', dtype=dtype, shape=shape)
+            array.flush()
+            del array
+        with open(osp.join(root, 'index.json'), 'w') as f:
+            json.dump(dict(tokens=list(tokens), bev_shape=list(bev_shape),
+                           bbox_shape=list(bbox_shape)), f)
+        return cls(root, mode='r+')
+
+    @property
+    def arrays(self):
+        # opened lazily so that data loader workers map the files themselves
+        # instead of receiving a pickled copy of the arrays
+        if self._arrays is None:
+            self._arrays = {
+                name: np.load(osp.join(self.root, f'{name}.npy'), mmap_mode=self.mode)
+                for name in self.ARRAYS}
+        return self._arrays
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_arrays'] = None
+        return state
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def __contains__(self, token):
+        row = self.token2row.get(token)
+        return row is not None and bool(self.arrays['written'][row])
+
+    def write(self, token, bev_embed, bbox_preds, assigned_gt):
+        """Fill the row of `token`.
+
+        Args:
+            token (str): Sample token.
+            bev_embed (np.ndarray): (bev_h * bev_w, embed_dims) BEV features.
+            bbox_preds (np.ndarray): (num_query, code_size) last decoder layer boxes.
+            assigned_gt (np.ndarray): (num_query,) index of the assigned gt box of
+                each query, -1 for unassigned queries.
+        """
+        row = self.token2row[token]
+        arrays = self.arrays
+        arrays['bev_embed'][row] = bev_embed
+        arrays['bbox_preds'][row] = bbox_preds
+        arrays['assigned_gt'][row] = assigned_gt
+        arrays['written'][row] = 1
+
+    def read(self, token):
+        """Return the arrays of `token` as a dict, copied out of the memory map."""
+        row = self.token2row[token]
+        arrays = self.arrays
+        return dict(
+            bev_embed=np.array(arrays['bev_embed'][row]),
+            bbox_preds=np.array(arrays['bbox_preds'][row]),
+            assigned_gt=np.array(arrays['assigned_gt'][row]))
+
+    def flush(self):
+        if self._arrays is not None:
+            for array in self._arrays.values():
+                array.flush()
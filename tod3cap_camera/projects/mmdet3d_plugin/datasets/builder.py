@@ -61,6 +61,7 @@ def build_dataloader(dataset,
             sampler = build_sampler(nonshuffler_sampler if nonshuffler_sampler is not None else dict(type='DistributedSampler'),
                                      dict(
                                          dataset=dataset,
+                                         samples_per_gpu=samples_per_gpu,
                                          num_replicas=world_size,
                                          rank=rank,
                                          shuffle=shuffle,
@@ -0,0 +1,96 @@
+import json
+from os import path as osp
+
+import mmcv
+import numpy as np
+
+
+class CaptionTokenStore(object):
+    """Memory-mapped, pre-tokenized captions keyed by box (sample annotation) token.
+
+    Every caption is stored as the token ids of ``format_prompt(instruction) +
+    caption`` with bos and eos, exactly what `CustomNuScenesDataset.cap_pipeline`
+    used to compute with SentencePiece for every box of every frame. Data loader
+    workers then only slice an int32 array instead of holding the caption json
+    and the tokenizer.
+
+    Layout of ``root``::
+
+        index.json   box tokens in row order, the prompt length and the
+                     row of the fallback caption for boxes without caption
+        ids.npy      (total_ids,) int32, token ids of all captions, concatenated
+        offsets.npy  (num_rows + 1,) int64, caption i is ids[offsets[i]:offsets[i + 1]]
+
+    Args:
+        root (str): Directory of the store.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        index = mmcv.load(osp.join(root, 'index.json'))
+        self.prompt_len = index['prompt_len']
+        self.fallback_row = index['fallback_row']
+        self.token2row = {token: row for row, token in enumerate(index['tokens'])}
+        self._arrays = None
+
+    @classmethod
+    def build(cls, caption_anno_path, tokenizer_path, root,
+              instruction='Describe the object in detail.',
+              fallback='The object is ignored'):
+        """Tokenize the captions of `caption_anno_path` into a store at `root`.
+
+        Args:
+            caption_anno_path (str): Caption json, {box_token: {'final_caption': str}}.
+            tokenizer_path (str): SentencePiece model of LLaMA.
+            root (str): Output directory.
+            instruction (str): Instruction of the caption prompt.
+            fallback (str): Caption of boxes missing from the json.
+        """
+        from llama import Tokenizer
+        from llama.utils import format_prompt
+
+        tokenizer = Tokenizer(model_path=tokenizer_path)
+        caplist = mmcv.load(caption_anno_path)
+        prompt = format_prompt(instruction, None)
+
+        tokens = list(caplist.keys())
+        captions = [caplist[token]['final_caption'] for token in tokens] + [fallback]
+        ids = [tokenizer.encode(prompt + caption, bos=True, eos=True) for caption in captions]
+        offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(t) for t in ids])
+
+        mmcv.mkdir_or_exist(root)
+        np.save(osp.join(root, 'ids.npy'), np.concatenate([np.asarray(t, dtype=np.int32) for t in ids]))
+        np.save(osp.join(root, 'offsets.npy'), offsets)
+        with open(osp.join(root, 'index.json'), 'w') as f:
+            json.dump(dict(
+                tokens=tokens,
+                prompt_len=len(tokenizer.encode(prompt, bos=True, eos=False)),
+                fallback_row=len(tokens)), f)
+        return cls(root)
+
+    @property
+    def arrays(self):
+        # opened lazily so that every data loader worker maps the files itself
+        if self._arrays is None:
+            self._arrays = {
+                name: np.load(osp.join(self.root, f'{name}.npy'), mmap_mode='r')
+                for name in ('ids', 'offsets')}
+        return self._arrays
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_arrays'] = None
+        return state
+
+    def __len__(self):
+        return len(self.token2row)
+
+    def __contains__(self, token):
+        return token in self.token2row
+
+    def __getitem__(self, token):
+        """Token ids (int32) of the caption of box `token`, or of the fallback caption."""
+        row = self.token2row.get(token, self.fallback_row)
+        offsets = self.arrays['offsets']
+        return np.array(self.arrays['ids'][offsets[row]:offsets[row + 1]])
@@ -0,0 +1,170 @@
+import json
+from collections.abc import Sequence
+from os import path as osp
+
+import mmcv
+import numpy as np
+
+
+class ColumnarInfos(Sequence):
+    """Memory-mapped, columnar copy of the infos of a ``*_infos_temporal_*.pkl``.
+
+    A list of nested dicts is touched by the reference counting of every data
+    loader worker, so the forked workers end up with their own copy of all
+    the infos. Here every field is one NumPy array over all samples (strings
+    as fixed-width unicode arrays), memory-mapped read-only and shared by the
+    workers through the page cache. Indexing builds the info dict of one
+    sample, with the same keys as the pickled infos, so the dataset code is
+    unchanged; the returned arrays are copies and can be modified.
+
+    Variable-length fields (sweeps and annotations) are stored flat with
+    ``*.offsets`` arrays, the rows of sample i being ``offsets[i]:offsets[i + 1]``.
+
+    Layout of ``root``::
+
+        index.json     metadata of the pkl, camera names and stored fields
+        <field>.npy    (num_samples, ...) sample fields, e.g. ``can_bus.npy``
+        cams.<field>.npy     (num_samples, num_cams, ...) camera fields
+        sweeps.<field>.npy   (num_sweeps, ...) sweep fields, ragged
+        anns.<field>.npy     (num_boxes, ...) annotation fields, ragged
+
+    Args:
+        root (str): Directory written by `export`.
+        rows (np.ndarray, optional): Rows of the export to expose, in order.
+            Defaults to all of them.
+    """
+
+    SAMPLE_STR = ('token', 'prev', 'next', 'scene_token', 'lidar_path')
+    SAMPLE_NUM = ('timestamp', 'frame_idx', 'can_bus', 'lidar2ego_translation',
+                  'lidar2ego_rotation', 'ego2global_translation', 'ego2global_rotation')
+    SWEEP_STR = ('data_path', 'type', 'sample_data_token')
+    SWEEP_NUM = ('sensor2ego_translation', 'sensor2ego_rotation', 'ego2global_translation',
+                 'ego2global_rotation', 'timestamp', 'sensor2lidar_rotation',
+                 'sensor2lidar_translation')
+    CAM_STR = SWEEP_STR
+    CAM_NUM = SWEEP_NUM + ('cam_intrinsic', )
+    ANN_STR = ('gt_names', 'gt_captions')
+    ANN_NUM = ('gt_boxes', 'gt_velocity', 'num_lidar_pts', 'num_radar_pts', 'valid_flag')
+
+    def __init__(self, root, rows=None):
+        self.root = root
+        index = mmcv.load(osp.join(root, 'index.json'))
+        self.metadata = index['metadata']
+        self.cam_names = index['cam_names']
+        self.with_ann = index['with_ann']
+        self.num_samples = index['num_samples']
+        self.rows = np.arange(self.num_samples) if rows is None else np.asarray(rows)
+        self._arrays = {}
+
+    @classmethod
+    def export(cls, infos, root, metadata=None):
+        """Write `infos`, the list of info dicts of a pkl, to `root`.
+
+        Args:
+            infos (list[dict]): Infos of the samples.
+            root (str): Output directory.
+            metadata (dict, optional): ``metadata`` of the pkl.
+        """
+        mmcv.mkdir_or_exist(root)
+
+        def _save(name, array):
+            np.save(osp.join(root, f'{name}.npy'), array)
+
+        def _ragged(prefix, rows, str_keys, num_keys):
+            # rows[i] is the list of dicts (sweeps) of sample i
+            _save(f'{prefix}.offsets', np.cumsum([0] + [len(r) for r in rows], dtype=np.int64))
+            flat = [item for r in rows for item in r]
+            for key in str_keys:
+                _save(f'{prefix}.{key}', np.array([item[key] for item in flat], dtype=str))
+            for key in num_keys:
+                _save(f'{prefix}.{key}', np.array([item[key] for item in flat]))
+
+        def _ragged_columns(prefix, infos, str_keys, num_keys):
+            # every info holds one array per key, all of the same length
+            counts = [len(info[num_keys[0]]) for info in infos]
+            _save(f'{prefix}.offsets', np.cumsum([0] + counts, dtype=np.int64))
+            for key in str_keys:
+                _save(f'{prefix}.{key}', np.array(
+                    [value for info in infos for value in info[key]], dtype=str))
+            for key in num_keys:
+                values = [np.asarray(info[key]) for info in infos]
+                tail = next((v.shape[1:] for v in values if len(v) > 0), ())
+                _save(f'{prefix}.{key}', np.concatenate(
+                    [v.reshape((len(v), ) + tail) for v in values]))
+
+        for key in cls.SAMPLE_STR:
+            _save(key, np.array([info[key] for info in infos], dtype=str))
+        for key in cls.SAMPLE_NUM:
+            _save(key, np.stack([np.asarray(info[key]) for info in infos]))
+
+        cam_names = list(infos[0]['cams'].keys())
+        for key in cls.CAM_STR:
+            _save(f'cams.{key}', np.array(
+                [[info['cams'][cam][key] for cam in cam_names] for info in infos], dtype=str))
+        for key in cls.CAM_NUM:
+            _save(f'cams.{key}', np.array(
+                [[info['cams'][cam][key] for cam in cam_names] for info in infos]))
+
+        _ragged('sweeps', [info['sweeps'] for info in infos], cls.SWEEP_STR, cls.SWEEP_NUM)
+        with_ann = 'gt_boxes' in infos[0]
+        if with_ann:
+            _ragged_columns('anns', infos, cls.ANN_STR, cls.ANN_NUM)
+
+        with open(osp.join(root, 'index.json'), 'w') as f:
+            json.dump(dict(metadata=metadata or {}, cam_names=cam_names,
+                           with_ann=with_ann, num_samples=len(infos)), f)
+        return cls(root)
+
+    def array(self, name):
+        # mapped lazily so that every data loader worker maps the files itself
+        if name not in self._arrays:
+            self._arrays[name] = np.load(osp.join(self.root, f'{name}.npy'), mmap_mode='r')
+        return self._arrays[name]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_arrays'] = {}
+        return state
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ColumnarInfos(self.root, self.rows[index])
+        row = int(self.rows[index])
+        info = {key: str(self.array(key)[row]) for key in self.SAMPLE_STR}
+        info.update({key: np.array(self.array(key)[row]) for key in self.SAMPLE_NUM})
+        info['timestamp'] = int(info['timestamp'])
+        info['frame_idx'] = int(info['frame_idx'])
+
+        info['cams'] = {}
+        for i, cam in enumerate(self.cam_names):
+            cam_info = {key: str(self.array(f'cams.{key}')[row, i]) for key in self.CAM_STR}
+            cam_info.update({key: np.array(self.array(f'cams.{key}')[row, i]) for key in self.CAM_NUM})
+            cam_info['timestamp'] = int(cam_info['timestamp'])
+            info['cams'][cam] = cam_info
+
+        offsets = self.array('sweeps.offsets')
+        info['sweeps'] = []
+        for j in range(offsets[row], offsets[row + 1]):
+            sweep = {key: str(self.array(f'sweeps.{key}')[j]) for key in self.SWEEP_STR}
+            sweep.update({key: np.array(self.array(f'sweeps.{key}')[j]) for key in self.SWEEP_NUM})
+            sweep['timestamp'] = int(sweep['timestamp'])
+            info['sweeps'].append(sweep)
+
+        if self.with_ann:
+            offsets = self.array('anns.offsets')
+            rows = slice(offsets[row], offsets[row + 1])
+            info.update({key: np.array(self.array(f'anns.{key}')[rows]) for key in self.ANN_STR + self.ANN_NUM})
+            info['gt_captions'] = list(info['gt_captions'])
+        return info
+
+    def column(self, key):
+        """Values of a sample field for the exposed rows, without building the infos."""
+        return self.array(key)[self.rows]
+
+    def sorted_rows(self, key='timestamp'):
+        """Rows of the export sorted (stably) by a numeric sample field."""
+        return np.argsort(self.array(key), kind='stable')
+
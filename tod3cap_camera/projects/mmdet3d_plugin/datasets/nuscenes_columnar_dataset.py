@@ -0,0 +1,23 @@
+from mmdet.datasets import DATASETS
+
+from .columnar_infos import ColumnarInfos
+from .nuscenes_dataset import CustomNuScenesDataset
+
+
+@DATASETS.register_module()
+class CustomNuScenesColumnarDataset(CustomNuScenesDataset):
+    """`CustomNuScenesDataset` reading the infos from a :obj:`ColumnarInfos` export.
+
+    ``ann_file`` is the directory written by ``tools/create_columnar_infos.py``
+    instead of the ``*_infos_temporal_*.pkl``. ``self.data_infos`` is then a
+    memory-mapped sequence shared by all data loader workers, building the
+    info dict of a sample when it is indexed.
+    """
+
+    def load_annotations(self, ann_file):
+        """Load the columnar infos of directory `ann_file`, sorted by timestamps."""
+        data_infos = ColumnarInfos(ann_file)
+        rows = data_infos.sorted_rows('timestamp')[::self.load_interval]
+        self.metadata = data_infos.metadata
+        self.version = self.metadata['version']
+        return ColumnarInfos(ann_file, rows)
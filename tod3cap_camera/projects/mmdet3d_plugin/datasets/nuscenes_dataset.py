@@ -12,32 +12,92 @@ from nuscenes.eval.common.utils import quaternion_yaw, Quaternion
 from .nuscnes_eval import NuScenesEval_custom
 from projects.mmdet3d_plugin.models.utils.visual import save_tensor
 from mmcv.parallel import DataContainer as DC
+from mmdet3d.datasets.pipelines import Compose
 import random
 
 import llama.utils
 from llama import Tokenizer
 from mmcv.parallel import DataContainer as DC
+from .bev_feature_store import BEVFeatureStore
+from .caption_token_store import CaptionTokenStore
 
 @DATASETS.register_module()
 class CustomNuScenesDataset(NuScenesDataset):
     r"""NuScenes Dataset.
 
     This datset only add camera intrinsics and extrinsics to the results.
+
+    With ``bev_cache_root``, training samples are read from a
+    :obj:`BEVFeatureStore` written by ``tools/precompute_bev_cache.py``: the
+    images are not loaded, only ``bev_cache_pipeline`` (annotation loading and
+    filtering) runs, and the cached BEV features, boxes and assignment are
+    attached as ``cached_bev_embed``, ``cached_bbox_preds`` and
+    ``cached_assigned_gt``.
+
+    With ``gt_cache_dir``, the ground truth boxes of the detection evaluation
+    are read from a cache built on the first evaluation (see
+    ``evaluate_utils/gt_cache.py``), and the :obj:`NuScenes` database is
+    loaded once and kept for the following evaluations.
+
+    With ``caption_token_root``, captions are read pre-tokenized from a
+    :obj:`CaptionTokenStore` built by ``tools/create_caption_tokens.py``
+    instead of being tokenized from the caption json for every box.
+
+    Only the annotations of the last frame of the temporal queue survive
+    `union2one`, so the history frames go through ``history_pipeline``, the
+    training pipeline without its annotation transforms and ``gt_*`` keys, and
+    skip annotation and caption processing.
     """
 
-    def __init__(self, queue_length=4, bev_size=(200, 200), overlap_test=False, *args, **kwargs):
+    # transforms that only load, filter or augment annotations
+    HISTORY_SKIPPED_TRANSFORMS = ('LoadAnnotations3D', 'ObjectRangeFilter',
+                                  'ObjectNameFilter', 'ObjectSample', 'ObjectNoise')
+
+    def __init__(self, queue_length=4, bev_size=(200, 200), overlap_test=False,
+                 bev_cache_root=None, bev_cache_pipeline=None, caption_token_root=None,
+                 gt_cache_dir=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.queue_length = queue_length
         self.overlap_test = overlap_test
         self.bev_size = bev_size
-
-        caption_anno_path = "data/nuscenes/final_caption_bbox_token.json" # fix this to your own
-        self.caplist = mmcv.load(caption_anno_path)
-        self.ignore_count = 0
-
-        # TODO: fix path and add this to config
-        tokenizer_path = "LLaMA-7B/tokenizer.model"  # fix this to your own
-        self.tokenizer = Tokenizer(model_path=tokenizer_path)
+        self.gt_cache_dir = gt_cache_dir
+        self.nusc = None
+
+        self.history_pipeline = None
+        if kwargs.get('pipeline') is not None and not self.test_mode:
+            self.history_pipeline = Compose(self.history_pipeline_cfg(kwargs['pipeline']))
+
+        self.bev_cache = None
+        if bev_cache_root is not None and not self.test_mode:
+            assert bev_cache_pipeline is not None, \
+                'bev_cache_pipeline is required to train from a BEV feature cache'
+            self.bev_cache = BEVFeatureStore(bev_cache_root)
+            self.bev_cache_pipeline = Compose(bev_cache_pipeline)
+
+        # captions longer than this are truncated
+        self.max_words = 512
+        self.caption_tokens = None
+        if caption_token_root is not None:
+            self.caption_tokens = CaptionTokenStore(caption_token_root)
+        else:
+            caption_anno_path = "data/nuscenes/final_caption_bbox_token.json" # fix this to your own
+            self.caplist = mmcv.load(caption_anno_path)
+            self.ignore_count = 0
+
+            # TODO: fix path and add this to config
+            tokenizer_path = "LLaMA-7B/tokenizer.model"  # fix this to your own
+            self.tokenizer = Tokenizer(model_path=tokenizer_path)
+
+    def history_pipeline_cfg(self, pipeline):
+        """Strip the annotation transforms and ``gt_*`` keys off `pipeline`."""
+        history_pipeline = []
+        for transform in copy.deepcopy(pipeline):
+            if transform['type'] in self.HISTORY_SKIPPED_TRANSFORMS:
+                continue
+            if 'keys' in transform and transform['type'].endswith('Collect3D'):
+                transform['keys'] = [k for k in transform['keys'] if not k.startswith('gt_')]
+            history_pipeline.append(transform)
+        return history_pipeline
 
     def prepare_train_data(self, index):
         """
@@ -47,82 +107,116 @@ class CustomNuScenesDataset(NuScenesDataset):
         Returns:
             dict: Training data dict of the corresponding index.
         """
+        if self.bev_cache is not None:
+            return self.prepare_cached_train_data(index)
+
         queue = []
         index_list = list(range(index-self.queue_length, index))
         random.shuffle(index_list)
         index_list = sorted(index_list[1:])
         index_list.append(index)
-        for i in index_list:
-            i = max(0, i)
-            input_dict = self.get_data_info(i)
+        for i in index_list[:-1]:
+            # history frames only contribute images and metas
+            input_dict = self.get_data_info(max(0, i), with_ann=False)
             if input_dict is None:
                 return None
             self.pre_pipeline(input_dict)
-            example = self.pipeline(input_dict)
+            example = self.history_pipeline(input_dict)
+            if example is None:
+                return None
+            queue.append(example)
 
-            example = self.cap_pipeline(example)
+        input_dict = self.get_data_info(index)
+        if input_dict is None:
+            return None
+        self.pre_pipeline(input_dict)
+        example = self.pipeline(input_dict)
+        if example is None:
+            return None
 
+        example = self.cap_pipeline(example)
 
-            if self.filter_empty_gt and \
-                    (example is None or ~(example['gt_labels_3d']._data != -1).any()):
-                return None
-            queue.append(example)
+        if self.filter_empty_gt and \
+                ~(example['gt_labels_3d']._data != -1).any():
+            return None
+        queue.append(example)
         return self.union2one(queue)
 
+    def prepare_cached_train_data(self, index):
+        """Training data preparation from the BEV feature cache.
+
+        The history frames and the images are not needed, the frozen encoder
+        outputs of the sample are read from ``self.bev_cache`` instead.
+        """
+        input_dict = self.get_data_info(index)
+        if input_dict is None or input_dict['sample_idx'] not in self.bev_cache:
+            return None
+        self.pre_pipeline(input_dict)
+        example = self.bev_cache_pipeline(input_dict)
+        if example is None:
+            return None
+
+        example = self.cap_pipeline(example)
+
+        if self.filter_empty_gt and \
+                ~(example['gt_labels_3d']._data != -1).any():
+            return None
+
+        cached = self.bev_cache.read(input_dict['sample_idx'])
+        example.update({
+            'cached_bev_embed': DC(torch.from_numpy(cached['bev_embed']), stack=True),
+            'cached_bbox_preds': DC(torch.from_numpy(cached['bbox_preds']), stack=True),
+            'cached_assigned_gt': DC(torch.from_numpy(cached['assigned_gt']).long(), stack=True),
+        })
+        return example
+
     def cap_pipeline(self, example):
         gt_captions_3d = example['gt_captions_3d']
-        format_gt_captions_3d = []
-        format_gt_caplabels_3d = []
-        format_gt_capmask_3d = []
+        caption_ids = []
+        prompt_lens = []
         # change instruction and answer
         for answer_token in gt_captions_3d:
-            if answer_token in self.caplist:
-                answer = self.caplist[answer_token]['final_caption']
+            if self.caption_tokens is not None:
+                # pre-tokenized prompt + answer, a slice of the memory-mapped store
+                input2 = torch.from_numpy(self.caption_tokens[answer_token])
+                prompt_len = self.caption_tokens.prompt_len
             else:
-                answer = "The object is ignored"
-                # self.ignore_count = self.ignore_count +1
-                # if self.ignore_count % 10 == 0:
-                #     print(self.ignore_count)
-
-            instruction = "Describe the object in detail."
-            input1 = llama.utils.format_prompt(instruction, None)
-            input2 = input1 + answer
-
-
-
-            max_words = 512
-
-            input1 = torch.tensor(self.tokenizer.encode(input1, bos=True, eos=False), dtype=torch.int64)
-            input2 = torch.tensor(self.tokenizer.encode(input2, bos=True, eos=True), dtype=torch.int64)
-            padding = max_words - input2.shape[0]
-            if padding > 0:
-                input2 = torch.cat((input2, torch.zeros(padding, dtype=torch.int64) - 1))
-            elif padding < 0:
-                input2 = input2[:max_words]
-            labels = copy.deepcopy(input2)
-            labels[:len(input1)] = -1
-            input2_mask = input2.ge(0)
-            label_mask = labels.ge(0)
-            input2[~input2_mask] = 0
-            labels[~label_mask] = 0
-            input2_mask = input2_mask.float()
-            label_mask = label_mask.float()
-            format_gt_captions_3d.append(input2)
-            format_gt_caplabels_3d.append(labels)
-            format_gt_capmask_3d.append(input2_mask)
-
-        if len(format_gt_captions_3d) == 0:
-            example.update({
-                "gt_captions_3d": DC(torch.empty((0, 512))),
-                "gt_caplabels_3d": DC(torch.empty((0, 512))),
-                "gt_capmask_3d": DC(torch.empty((0, 512))),
-            })
-        else:
-            example.update({
-                "gt_captions_3d": DC(torch.stack(format_gt_captions_3d, dim=0)),
-                "gt_caplabels_3d": DC(torch.stack(format_gt_caplabels_3d, dim=0)),
-                "gt_capmask_3d": DC(torch.stack(format_gt_capmask_3d, dim=0)),
-            })
+                if answer_token in self.caplist:
+                    answer = self.caplist[answer_token]['final_caption']
+                else:
+                    answer = "The object is ignored"
+                    # self.ignore_count = self.ignore_count +1
+                    # if self.ignore_count % 10 == 0:
+                    #     print(self.ignore_count)
+
+                instruction = "Describe the object in detail."
+                input1 = llama.utils.format_prompt(instruction, None)
+                input2 = input1 + answer
+
+                input1 = self.tokenizer.encode(input1, bos=True, eos=False)
+                input2 = torch.tensor(self.tokenizer.encode(input2, bos=True, eos=True), dtype=torch.int32)
+                prompt_len = len(input1)
+
+            caption_ids.append(input2[:self.max_words])
+            prompt_lens.append(prompt_len)
+
+        # rows are padded with 0 (ignored by the caption loss) only up to the
+        # longest caption of the frame instead of max_words, `LLaMA_adapter.forward`
+        # trims them again to the longest caption among the sampled boxes
+        word_len = max([len(ids) for ids in caption_ids], default=0)
+        captions = torch.zeros((len(caption_ids), word_len), dtype=torch.int32)
+        caplabels = torch.zeros((len(caption_ids), word_len), dtype=torch.int32)
+        capmask = torch.zeros((len(caption_ids), word_len))
+        for i, (ids, prompt_len) in enumerate(zip(caption_ids, prompt_lens)):
+            captions[i, :len(ids)] = ids
+            caplabels[i, prompt_len:len(ids)] = ids[prompt_len:]
+            capmask[i, :len(ids)] = 1
+
+        example.update({
+            "gt_captions_3d": DC(captions),
+            "gt_caplabels_3d": DC(caplabels),
+            "gt_capmask_3d": DC(capmask),
+        })
 
         return example
 
@@ -160,11 +254,12 @@ class CustomNuScenesDataset(NuScenesDataset):
         queue = queue[-1]
         return queue
 
-    def get_data_info(self, index):
+    def get_data_info(self, index, with_ann=True):
         """Get data info according to the given index.
 
         Args:
             index (int): Index of the sample data to get.
+            with_ann (bool): Whether to add the annotations in training mode.
 
         Returns:
             dict: Data information that will be passed to the data \
@@ -226,7 +321,7 @@ class CustomNuScenesDataset(NuScenesDataset):
                     lidar2cam=lidar2cam_rts,
                 ))
 
-        if not self.test_mode:
+        if not self.test_mode and with_ann:
             annos = self.get_ann_info(index)
             input_dict['ann_info'] = annos
 
@@ -277,8 +372,10 @@ class CustomNuScenesDataset(NuScenesDataset):
             dict: Dictionary of evaluation details.
         """
         from nuscenes import NuScenes
-        self.nusc = NuScenes(version=self.version, dataroot=self.data_root,
-                             verbose=True)
+        # parsing all the tables takes minutes, the database is kept across evaluations
+        if self.nusc is None or self.nusc.version != self.version:
+            self.nusc = NuScenes(version=self.version, dataroot=self.data_root,
+                                 verbose=True)
 
         output_dir = osp.join(*osp.split(result_path)[:-1])
 
@@ -294,7 +391,8 @@ class CustomNuScenesDataset(NuScenesDataset):
             output_dir=output_dir,
             verbose=True,
             overlap_test=self.overlap_test,
-            data_infos=self.data_infos
+            data_infos=self.data_infos,
+            gt_cache_dir=self.gt_cache_dir
         )
         self.nusc_eval.main(plot_examples=0, render_curves=False)
         # record metrics
@@ -50,6 +50,7 @@ from nuscenes.eval.detection.data_classes import DetectionConfig, DetectionMetri
 from nuscenes.eval.detection.render import summary_plot, class_pr_curve, dist_pr_curve, visualize_sample
 from nuscenes.eval.common.utils import quaternion_yaw, Quaternion
 from mmdet3d.core.bbox.iou_calculators import BboxOverlaps3D
+from evaluate_utils.gt_cache import gt_boxes_from_arrays, load_gt_arrays
 from IPython import embed
 import json
 from typing import Any
@@ -241,13 +242,14 @@ def exist_corners_in_image_but_not_all(box, intrinsic: np.ndarray, imsize: Tuple
         return False
 
 
-def load_gt(nusc: NuScenes, eval_split: str, box_cls, verbose: bool = False):
+def load_gt(nusc: NuScenes, eval_split: str, box_cls, verbose: bool = False, cache_dir: str = None):
     """
     Loads ground truth boxes from DB.
     :param nusc: A NuScenes instance.
     :param eval_split: The evaluation split for which we load GT boxes.
     :param box_cls: Type of box to load, e.g. DetectionBox or TrackingBox.
     :param verbose: Whether to print messages to stdout.
+    :param cache_dir: Directory of the ground truth cache (see evaluate_utils/gt_cache.py). None reads the DB.
     :return: The GT boxes.
     """
 
@@ -283,6 +285,28 @@ def load_gt(nusc: NuScenes, eval_split: str, box_cls, verbose: bool = False):
         # Check that you aren't trying to cheat :).
         assert len(nusc.sample_annotation) > 0, \
             'Error: You are trying to evaluate on the test set but you do not have the annotations!'
+
+    if cache_dir is not None and box_cls == DetectionBox_modified:
+        all_annotations = gt_boxes_from_arrays(
+            load_gt_arrays(nusc, eval_split, cache_dir, verbose=verbose),
+            lambda sample_token, sample_index, row: box_cls(
+                token=row['token'],
+                sample_token=sample_token,
+                translation=row['translation'],
+                size=row['size'],
+                rotation=row['rotation'],
+                velocity=row['velocity'],
+                num_pts=row['num_pts'],
+                detection_name=row['detection_name'],
+                detection_score=-1.0,  # GT samples do not have a score.
+                attribute_name=row['attribute_name'],
+                visibility=row['visibility'],
+                index=sample_index
+            ))
+        if verbose:
+            print("Loaded ground truth annotations for {} samples.".format(len(all_annotations.sample_tokens)))
+        return all_annotations
+
     index_map = {}
     for scene in nusc.scene:
         first_sample_token = scene['first_sample_token']
@@ -431,11 +455,37 @@ def filter_by_sample_token(ori_eval_boxes, valid_sample_tokens=[],  verbose=Fals
     return eval_boxes
 
 
+def camera_projections(nusc: NuScenes, sample_token: str, cams) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Global to camera transforms, intrinsics and image sizes of the cameras of a sample.
+    :param nusc: An instance of the NuScenes class.
+    :param sample_token: Token of the sample.
+    :param cams: Camera channels.
+    :return: <float: n_cams, 4, 4> global to camera matrices, <float: n_cams, 3, 3> intrinsics and
+        <int: n_cams, 2> (width, height).
+    """
+    sample_record = nusc.get('sample', sample_token)
+    global2cams, intrinsics, imsizes = [], [], []
+    for cam in cams:
+        sd_record = nusc.get('sample_data', sample_record['data'][cam])
+        cs_record = nusc.get('calibrated_sensor', sd_record['calibrated_sensor_token'])
+        pose_record = nusc.get('ego_pose', sd_record['ego_pose_token'])
+        global2ego = transform_matrix(pose_record['translation'], Quaternion(pose_record['rotation']), inverse=True)
+        ego2cam = transform_matrix(cs_record['translation'], Quaternion(cs_record['rotation']), inverse=True)
+        global2cams.append(ego2cam @ global2ego)
+        intrinsics.append(np.array(cs_record['camera_intrinsic']))
+        imsizes.append((sd_record['width'], sd_record['height']))
+    return np.stack(global2cams), np.stack(intrinsics), np.array(imsizes)
+
+
 def filter_eval_boxes_by_overlap(nusc: NuScenes,
                                  eval_boxes: EvalBoxes,
                                  verbose: bool = False) -> EvalBoxes:
     """
     Applies filtering to boxes. basedon overlap .
+    Keeps the boxes whose center is visible (see `center_in_image`) in more than one camera. The centers of all the
+    boxes of a sample are projected into the six cameras at once, the tokens of the kept boxes are appended to
+    center_overlap.txt.
     :param nusc: An instance of the NuScenes class.
     :param eval_boxes: An instance of the EvalBoxes class.
     :param verbose: Whether to print to stdout.
@@ -450,51 +500,39 @@ def filter_eval_boxes_by_overlap(nusc: NuScenes,
             'CAM_FRONT_LEFT']
 
     total, anns_filter = 0, 0
+    overlap_tokens = []
     for ind, sample_token in enumerate(eval_boxes.sample_tokens):
 
         # Filter on anns
-        total += len(eval_boxes[sample_token])
-        sample_record = nusc.get('sample', sample_token)
-        filtered_boxes = []
-        for box in eval_boxes[sample_token]:
-            count = 0
-            for cam in cams:
-                '''
-                copy-paste form nuscens
-                '''
-                sample_data_token = sample_record['data'][cam]
-                sd_record = nusc.get('sample_data', sample_data_token)
-                cs_record = nusc.get('calibrated_sensor', sd_record['calibrated_sensor_token'])
-                sensor_record = nusc.get('sensor', cs_record['sensor_token'])
-                pose_record = nusc.get('ego_pose', sd_record['ego_pose_token'])
-                cam_intrinsic = np.array(cs_record['camera_intrinsic'])
-                imsize = (sd_record['width'], sd_record['height'])
-                new_box = Box(box.translation, box.size, Quaternion(box.rotation),
-                              name=box.detection_name, token='')
-
-                # Move box to ego vehicle coord system.
-                new_box.translate(-np.array(pose_record['translation']))
-                new_box.rotate(Quaternion(pose_record['rotation']).inverse)
-
-                #  Move box to sensor coord system.
-                new_box.translate(-np.array(cs_record['translation']))
-                new_box.rotate(Quaternion(cs_record['rotation']).inverse)
-
-                if center_in_image(new_box, cam_intrinsic, imsize, vis_level=BoxVisibility.ANY):
-                    count += 1
-                # if exist_corners_in_image_but_not_all(new_box, cam_intrinsic, imsize, vis_level=BoxVisibility.ANY):
-                #    count += 1
-
-            if count > 1:
-                with open('center_overlap.txt', 'a') as f:
-                    try:
-                        f.write(box.token + '\n')
-                    except:
-                        pass
-                filtered_boxes.append(box)
+        boxes = eval_boxes[sample_token]
+        total += len(boxes)
+        if len(boxes) == 0:
+            continue
+        global2cams, intrinsics, imsizes = camera_projections(nusc, sample_token, cams)
+
+        # <n_cams, n_boxes, 3> box centers in the camera frames, the rotation of a box does not move its center
+        centers = np.concatenate([np.array([box.translation for box in boxes]), np.ones((len(boxes), 1))], axis=1)
+        centers_cam = np.einsum('cij,nj->cni', global2cams, centers)[..., :3]
+        depth = centers_cam[..., 2]
+        centers_img = np.einsum('cij,cnj->cni', intrinsics, centers_cam)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            centers_img = centers_img[..., :2] / centers_img[..., 2:3]
+
+        visible = (centers_img[..., 0] > 0) & (centers_img[..., 0] < imsizes[:, None, 0])
+        visible &= (centers_img[..., 1] > 0) & (centers_img[..., 1] < imsizes[:, None, 1])
+        visible &= depth > 1
+        keep = visible.sum(axis=0) > 1
+
+        filtered_boxes = [box for box, k in zip(boxes, keep) if k]
+        overlap_tokens.extend(getattr(box, 'token', None) for box in filtered_boxes)
         anns_filter += len(filtered_boxes)
         eval_boxes.boxes[sample_token] = filtered_boxes
 
+    overlap_tokens = [token for token in overlap_tokens if isinstance(token, str)]
+    if overlap_tokens:
+        with open('center_overlap.txt', 'a') as f:
+            f.write(''.join(token + '\n' for token in overlap_tokens))
+
     verbose = True
 
     if verbose:
@@ -518,7 +556,8 @@ class NuScenesEval_custom(NuScenesEval):
                  verbose: bool = True,
                  overlap_test=False,
                  eval_mask=False,
-                 data_infos=None
+                 data_infos=None,
+                 gt_cache_dir=None
                  ):
         """
         Initialize a DetectionEval object.
@@ -528,6 +567,7 @@ class NuScenesEval_custom(NuScenesEval):
         :param eval_set: The dataset split to evaluate on, e.g. train, val or test.
         :param output_dir: Folder to save plots and results to.
         :param verbose: Whether to print to stdout.
+        :param gt_cache_dir: Directory of the cached ground truth boxes, None loads them from the DB.
         """
 
         self.nusc = nusc
@@ -554,7 +594,8 @@ class NuScenesEval_custom(NuScenesEval):
             print('Initializing nuScenes detection evaluation')
         self.pred_boxes, self.meta = load_prediction(self.result_path, self.cfg.max_boxes_per_sample, DetectionBox,
                                                      verbose=verbose)
-        self.gt_boxes = load_gt(self.nusc, self.eval_set, DetectionBox_modified, verbose=verbose)
+        self.gt_boxes = load_gt(self.nusc, self.eval_set, DetectionBox_modified, verbose=verbose,
+                                cache_dir=gt_cache_dir)
 
         assert set(self.pred_boxes.sample_tokens) == set(self.gt_boxes.sample_tokens), \
             "Samples in split doesn't match samples in predictions."
@@ -1,13 +1,16 @@
 from .transform_3d import (
     PadMultiViewImage, NormalizeMultiviewImage, 
-    PhotoMetricDistortionMultiViewImage, CustomCollect3D, RandomScaleImageMultiViewImage)
+    PhotoMetricDistortionMultiViewImage, CustomCollect3D, RandomScaleImageMultiViewImage,
+    NormalizePadMultiViewImage)
 from .formating import CustomDefaultFormatBundle3D
+from .loading import ParallelLoadMultiViewImageFromFiles
 from .augmentation import (CropResizeFlipImage, GlobalRotScaleTransImage)
 from .dd3d_mapper import DD3DMapper
 __all__ = [
     'PadMultiViewImage', 'NormalizeMultiviewImage', 
     'PhotoMetricDistortionMultiViewImage', 'CustomDefaultFormatBundle3D', 'CustomCollect3D',
-    'RandomScaleImageMultiViewImage',
+    'RandomScaleImageMultiViewImage', 'ParallelLoadMultiViewImageFromFiles',
+    'NormalizePadMultiViewImage',
     'CropResizeFlipImage', 'GlobalRotScaleTransImage',
     'DD3DMapper',
 ]
\ No newline at end of file
@@ -0,0 +1,132 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import mmcv
+import numpy as np
+from mmdet.datasets.builder import PIPELINES
+
+
+@PIPELINES.register_module()
+class ParallelLoadMultiViewImageFromFiles(object):
+    """Load the multi-view images, decoding the views concurrently.
+
+    Drop-in replacement of `LoadMultiViewImageFromFiles`. The views are decoded
+    on a small thread pool (OpenCV releases the GIL while decoding) and copied
+    once into a preallocated (num_views, h, w, c) buffer, converted to float32
+    on the way if needed; ``results['img']`` holds views into that buffer
+    instead of slices of a stacked copy.
+
+    With ``scale`` the JPEGs are decoded directly at reduced resolution by
+    libjpeg, which replaces a following ``RandomScaleImageMultiViewImage`` with
+    the same scale (remove it from the pipeline): `lidar2img`, `img_shape` and
+    `ori_shape` are updated the same way. Decoding at reduced resolution
+    averages the DCT blocks instead of resizing bilinearly, and happens before
+    the photometric and normalization transforms, so the pixel values differ
+    slightly from a full decode followed by a resize.
+
+    Args:
+        to_float32 (bool): Whether to convert the img to float32.
+            Defaults to False.
+        color_type (str): Color type of the file. Defaults to 'unchanged'.
+        num_threads (int): Number of decoding threads per data loader worker.
+            Defaults to 6.
+        scale (float, optional): Decode scale, one of 1/2, 1/4 and 1/8.
+            Defaults to None, full resolution.
+    """
+
+    REDUCED_FLAGS = {
+        0.5: cv2.IMREAD_REDUCED_COLOR_2,
+        0.25: cv2.IMREAD_REDUCED_COLOR_4,
+        0.125: cv2.IMREAD_REDUCED_COLOR_8,
+    }
+
+    def __init__(self, to_float32=False, color_type='unchanged', num_threads=6, scale=None):
+        assert scale is None or scale in self.REDUCED_FLAGS, \
+            f'scale must be one of {list(self.REDUCED_FLAGS)}, got {scale}'
+        self.to_float32 = to_float32
+        self.color_type = color_type
+        self.num_threads = num_threads
+        self.scale = scale
+        self._pool = None
+        self._pool_pid = None
+
+    @property
+    def pool(self):
+        # created lazily in every data loader worker, a pool inherited
+        # through fork has no threads
+        if self._pool is None or self._pool_pid != os.getpid():
+            self._pool = ThreadPoolExecutor(max_workers=self.num_threads)
+            self._pool_pid = os.getpid()
+        return self._pool
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_pool'] = None
+        state['_pool_pid'] = None
+        return state
+
+    def _imread(self, name):
+        if self.scale is not None:
+            img = cv2.imread(name, self.REDUCED_FLAGS[self.scale])
+            if img is None:
+                raise IOError(f'failed to read {name}')
+            return img
+        return mmcv.imread(name, self.color_type)
+
+    def __call__(self, results):
+        """Call function to load multi-view image from files.
+
+        Args:
+            results (dict): Result dict containing multi-view image filenames.
+
+        Returns:
+            dict: The result dict containing the multi-view image data, with
+                the keys of `LoadMultiViewImageFromFiles`.
+        """
+        filename = results['img_filename']
+        dtype = np.float32 if self.to_float32 else None
+
+        # the first view gives the buffer shape, the others are written in place
+        first = self._imread(filename[0])
+        buffer = np.empty((len(filename), ) + first.shape, dtype=dtype or first.dtype)
+        buffer[0] = first
+
+        def _load(i):
+            buffer[i] = self._imread(filename[i])
+
+        list(self.pool.map(_load, range(1, len(filename))))
+
+        results['filename'] = filename
+        results['img'] = [buffer[i] for i in range(len(filename))]
+        # (h, w, c, num_views) like the stacked array of `LoadMultiViewImageFromFiles`
+        img_shape = buffer.shape[1:] + (len(filename), )
+        results['img_shape'] = img_shape
+        results['ori_shape'] = img_shape
+        # Set initial values for default meta_keys
+        results['pad_shape'] = img_shape
+        results['scale_factor'] = 1.0
+        num_channels = 1 if len(buffer.shape) < 4 else buffer.shape[3]
+        results['img_norm_cfg'] = dict(
+            mean=np.zeros(num_channels, dtype=np.float32),
+            std=np.ones(num_channels, dtype=np.float32),
+            to_rgb=False)
+
+        if self.scale is not None:
+            # same bookkeeping as `RandomScaleImageMultiViewImage`
+            scale_factor = np.eye(4)
+            scale_factor[0, 0] *= self.scale
+            scale_factor[1, 1] *= self.scale
+            results['lidar2img'] = [scale_factor @ l2i for l2i in results['lidar2img']]
+            results['img_shape'] = [img.shape for img in results['img']]
+            results['ori_shape'] = [img.shape for img in results['img']]
+        return results
+
+    def __repr__(self):
+        """str: Return a string that describes the module."""
+        repr_str = self.__class__.__name__
+        repr_str += f'(to_float32={self.to_float32}, '
+        repr_str += f"color_type='{self.color_type}', "
+        repr_str += f'num_threads={self.num_threads}, '
+        repr_str += f'scale={self.scale})'
+        return repr_str
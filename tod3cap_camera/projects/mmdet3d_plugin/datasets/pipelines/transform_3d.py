@@ -1,6 +1,7 @@
 import numpy as np
 from numpy import random
 import mmcv
+import torch
 from mmdet.datasets.builder import PIPELINES
 from mmcv.parallel import DataContainer as DC
 
@@ -327,4 +328,97 @@ class RandomScaleImageMultiViewImage(object):
     def __repr__(self):
         repr_str = self.__class__.__name__
         repr_str += f'(size={self.scales}, '
-        return repr_str
\ No newline at end of file
+        return repr_str
+
+
+@PIPELINES.register_module()
+class NormalizePadMultiViewImage(object):
+    """Normalize, pad and stack the multi-view images into one tensor.
+
+    Fuses `NormalizeMultiviewImage`, `PadMultiViewImage` (``size_divisor``
+    mode) and the image part of `DefaultFormatBundle3D`: every view is written
+    normalized and transposed to CHW straight into its slot of a single
+    (num_views, C, H, W) tensor, instead of allocating a new array per view at
+    every step. `DefaultFormatBundle3D` then only wraps the tensor. The meta
+    keys are set as the three transforms would.
+
+    With ``normalize=False`` the views are only converted (and flipped to RGB
+    if ``to_rgb``) and the padding is filled with ``mean``, so that the
+    normalization of `BEVFormer` (``img_norm_cfg``) on the GPU gives the same
+    input as normalizing here; ``results['img_norm_cfg']`` records the
+    normalization still to be applied.
+
+    Args:
+        mean (sequence): Mean values of 3 channels.
+        std (sequence): Std values of 3 channels.
+        to_rgb (bool): Whether to convert the image from BGR to RGB,
+            default is true.
+        size_divisor (int): The divisor of padded size. Default: 32.
+        dtype (str): 'float32' or 'float16', dtype of the image tensor.
+        normalize (bool): Whether to normalize here or defer it to the model.
+    """
+
+    def __init__(self, mean, std, to_rgb=True, size_divisor=32, dtype='float32', normalize=True):
+        assert dtype in ('float32', 'float16')
+        self.mean = np.array(mean, dtype=np.float32)
+        self.std = np.array(std, dtype=np.float32)
+        self.to_rgb = to_rgb
+        self.size_divisor = size_divisor
+        self.dtype = dtype
+        self.normalize = normalize
+
+    def __call__(self, results):
+        """Call function to normalize, pad and stack images.
+        Args:
+            results (dict): Result dict from loading pipeline.
+        Returns:
+            dict: Updated result dict, ``results['img']`` is a
+                (num_views, C, H, W) tensor.
+        """
+        imgs = results['img']
+        num_channels = imgs[0].shape[2]
+        height = max(img.shape[0] for img in imgs)
+        width = max(img.shape[1] for img in imgs)
+        pad_h = int(np.ceil(height / self.size_divisor)) * self.size_divisor
+        pad_w = int(np.ceil(width / self.size_divisor)) * self.size_divisor
+
+        if self.normalize:
+            scale = (1 / self.std)[:, None, None]
+            shift = (-self.mean / self.std)[:, None, None]
+            pad_val = 0
+        else:
+            scale = np.ones((num_channels, 1, 1), dtype=np.float32)
+            shift = np.zeros((num_channels, 1, 1), dtype=np.float32)
+            pad_val = self.mean[:, None, None]
+        channels = slice(None, None, -1) if self.to_rgb else slice(None)
+
+        out = torch.empty((len(imgs), num_channels, pad_h, pad_w), dtype=getattr(torch, self.dtype))
+        out_np = out.numpy()
+        for i, img in enumerate(imgs):
+            h, w = img.shape[:2]
+            dst = out_np[i]
+            dst[:, h:] = pad_val
+            dst[:, :h, w:] = pad_val
+            src = img.transpose(2, 0, 1)[channels]
+            if out_np.dtype == np.float32:
+                np.multiply(src, scale, out=dst[:, :h, :w], casting='unsafe')
+                np.add(dst[:, :h, :w], shift, out=dst[:, :h, :w])
+            else:
+                dst[:, :h, :w] = src * scale + shift
+
+        results['ori_shape'] = [img.shape for img in imgs]
+        results['img'] = out
+        results['img_shape'] = [(pad_h, pad_w, num_channels)] * len(imgs)
+        results['pad_shape'] = [(pad_h, pad_w, num_channels)] * len(imgs)
+        results['pad_fixed_size'] = None
+        results['pad_size_divisor'] = self.size_divisor
+        results['img_norm_cfg'] = dict(
+            mean=self.mean, std=self.std, to_rgb=self.to_rgb, normalized=self.normalize)
+        return results
+
+    def __repr__(self):
+        repr_str = self.__class__.__name__
+        repr_str += f'(mean={self.mean}, std={self.std}, to_rgb={self.to_rgb}, '
+        repr_str += f'size_divisor={self.size_divisor}, dtype={self.dtype}, '
+        repr_str += f'normalize={self.normalize})'
+        return repr_str
@@ -1,4 +1,5 @@
 from .group_sampler import DistributedGroupSampler
 from .distributed_sampler import DistributedSampler
+from .scene_sampler import SceneInterleavedSampler, DistributedSceneSampler
 from .sampler import SAMPLER, build_sampler
 
@@ -10,10 +10,13 @@ class DistributedSampler(_DistributedSampler):
 
     def __init__(self,
                  dataset=None,
+                 samples_per_gpu=1,
                  num_replicas=None,
                  rank=None,
                  shuffle=True,
                  seed=0):
+        # `samples_per_gpu` is accepted for the samplers of `build_dataloader`
+        # and not used, samples are not grouped into batches here
         super().__init__(
             dataset, num_replicas=num_replicas, rank=rank, shuffle=shuffle)
         # for the compatibility from PyTorch 1.3+
@@ -28,6 +28,10 @@ class DistributedGroupSampler(Sampler):
         seed (int, optional): random seed used to shuffle the sampler if
             ``shuffle=True``. This number should be identical across all
             processes in the distributed group. Default: 0.
+        scene_order (bool, optional): Shuffle the order of the scenes instead
+            of the samples, every rank then walks the frames of its scenes in
+            time order, so consecutive samples share their history frames.
+            Default: False.
     """
 
     def __init__(self,
@@ -35,7 +39,8 @@ class DistributedGroupSampler(Sampler):
                  samples_per_gpu=1,
                  num_replicas=None,
                  rank=None,
-                 seed=0):
+                 seed=0,
+                 scene_order=False):
         _rank, _num_replicas = get_dist_info()
         if num_replicas is None:
             num_replicas = _num_replicas
@@ -47,6 +52,7 @@ class DistributedGroupSampler(Sampler):
         self.rank = rank
         self.epoch = 0
         self.seed = seed if seed is not None else 0
+        self.scene_order = scene_order
 
         assert hasattr(self.dataset, 'flag')
         self.flag = self.dataset.flag
@@ -72,8 +78,11 @@ class DistributedGroupSampler(Sampler):
                 # add .numpy() to avoid bug when selecting indice in parrots.
                 # TODO: check whether torch.randperm() can be replaced by
                 # numpy.random.permutation().
-                indice = indice[list(
-                    torch.randperm(int(size), generator=g).numpy())].tolist()
+                if self.scene_order:
+                    indice = self.shuffle_scenes(indice, g)
+                else:
+                    indice = indice[list(
+                        torch.randperm(int(size), generator=g).numpy())].tolist()
                 extra = int(
                     math.ceil(
                         size * 1.0 / self.samples_per_gpu / self.num_replicas)
@@ -87,13 +96,14 @@ class DistributedGroupSampler(Sampler):
 
         assert len(indices) == self.total_size
 
-        indices = [
-            indices[j] for i in list(
-                torch.randperm(
-                    len(indices) // self.samples_per_gpu, generator=g))
-            for j in range(i * self.samples_per_gpu, (i + 1) *
-                           self.samples_per_gpu)
-        ]
+        if not self.scene_order:
+            indices = [
+                indices[j] for i in list(
+                    torch.randperm(
+                        len(indices) // self.samples_per_gpu, generator=g))
+                for j in range(i * self.samples_per_gpu, (i + 1) *
+                               self.samples_per_gpu)
+            ]
 
         # subsample
         offset = self.num_samples * self.rank
@@ -102,6 +112,19 @@ class DistributedGroupSampler(Sampler):
 
         return iter(indices)
 
+    def shuffle_scenes(self, indice, g):
+        """Shuffle the runs of consecutive frames of one scene in `indice`."""
+        scenes = []
+        prev_scene_token = None
+        for index in indice:
+            scene_token = self.dataset.data_infos[index]['scene_token']
+            if scene_token != prev_scene_token:
+                scenes.append([])
+                prev_scene_token = scene_token
+            scenes[-1].append(int(index))
+        return [index for i in torch.randperm(len(scenes), generator=g).tolist()
+                for index in scenes[i]]
+
     def __len__(self):
         return self.num_samples
 
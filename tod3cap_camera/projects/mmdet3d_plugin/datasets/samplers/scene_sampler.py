@@ -0,0 +1,197 @@
+import math
+
+import numpy as np
+import torch
+from mmcv.runner import get_dist_info
+from torch.utils.data import Sampler
+from .sampler import SAMPLER
+
+
+def scene_groups(dataset):
+    """Split the dataset indices into runs of consecutive frames of one scene.
+
+    The infos of the nuScenes datasets are ordered by scene and timestamp.
+    """
+    if hasattr(dataset.data_infos, 'column'):
+        # `ColumnarInfos`, read the scene tokens without building every info
+        scene_tokens = dataset.data_infos.column('scene_token')
+    else:
+        scene_tokens = [info['scene_token'] for info in dataset.data_infos]
+    groups = []
+    prev_scene_token = None
+    for index, scene_token in enumerate(scene_tokens):
+        if scene_token != prev_scene_token:
+            groups.append([])
+            prev_scene_token = scene_token
+        groups[-1].append(index)
+    return groups
+
+
+def split_scenes(groups, num_replicas):
+    """Cut the scenes into `num_replicas` contiguous chunks of similar number of frames."""
+    sizes = np.cumsum([len(group) for group in groups])
+    bounds = np.searchsorted(sizes, sizes[-1] * np.arange(1, num_replicas) / num_replicas)
+    bounds = [0] + list(bounds + 1) + [len(groups)]
+    return [groups[bounds[r]:bounds[r + 1]] for r in range(num_replicas)]
+
+
+@SAMPLER.register_module()
+class SceneInterleavedSampler(Sampler):
+    """Test sampler interleaving several scenes into every batch for video inference.
+
+    Each rank gets a contiguous chunk of whole scenes. Its frames are played on
+    `samples_per_gpu` lanes: every batch holds the next frame of the scene of
+    each lane, and a lane moves on to the next unplayed scene when its scene
+    ends. Together with the per-scene temporal state of `BEVFormer.forward_test`
+    every row keeps its own history, so ``samples_per_gpu`` can be raised at
+    test time. `build_dataloader` passes the ``samples_per_gpu`` of the data
+    loader.
+
+    No sample is padded and the chunks of the ranks are contiguous, so the
+    results gathered by `custom_multi_gpu_test` are in dataset order once every
+    rank has applied `restore_order`.
+    """
+
+    def __init__(self,
+                 dataset=None,
+                 samples_per_gpu=1,
+                 num_replicas=None,
+                 rank=None,
+                 shuffle=False,
+                 seed=0):
+        assert not shuffle, 'SceneInterleavedSampler is a test sampler'
+        _rank, _num_replicas = get_dist_info()
+        if num_replicas is None:
+            num_replicas = _num_replicas
+        if rank is None:
+            rank = _rank
+        self.dataset = dataset
+        self.samples_per_gpu = samples_per_gpu
+        self.num_replicas = num_replicas
+        self.rank = rank
+
+        scenes = split_scenes(scene_groups(dataset), num_replicas)[rank]
+        self.indices = self.interleave(scenes, samples_per_gpu)
+
+    @staticmethod
+    def interleave(scenes, num_lanes):
+        indices = []
+        scenes = iter(scenes)
+        lanes = [iter(next(scenes, [])) for _ in range(num_lanes)]
+        while lanes:
+            active = []
+            for lane in lanes:
+                index = next(lane, None)
+                while index is None:
+                    scene = next(scenes, None)
+                    if scene is None:
+                        break
+                    lane = iter(scene)
+                    index = next(lane, None)
+                if index is not None:
+                    indices.append(index)
+                    active.append(lane)
+            lanes = active
+        return indices
+
+    def restore_order(self, results):
+        """Reorder the results of this rank, produced in sampling order, by dataset index."""
+        assert len(results) == len(self.indices)
+        return [results[i] for i in np.argsort(self.indices, kind='stable')]
+
+    def __iter__(self):
+        return iter(self.indices)
+
+    def __len__(self):
+        return len(self.indices)
+
+
+@SAMPLER.register_module()
+class DistributedSceneSampler(Sampler):
+    """Training sampler keeping whole scenes on one rank and in time order.
+
+    Every epoch the scenes are shuffled and dealt to the ranks, each scene
+    going to the rank with the fewest frames so far, so the ranks get whole
+    scenes and about the same number of frames. A rank plays its scenes on
+    `samples_per_gpu` lanes like `SceneInterleavedSampler`: every batch holds
+    frames of different scenes, and consecutive batches move forward in time,
+    so the history frames of a sample were mostly read by the batches before.
+
+    The first ``skip_first`` frames of every scene are not sampled, so the
+    temporal queue ``index - queue_length .. index`` of
+    `CustomNuScenesDataset.prepare_train_data` stays inside the scene and
+    ``prev_bev_exists`` holds for every history frame. It defaults to the
+    ``queue_length`` of the dataset, 0 samples every frame.
+
+    The ranks are padded with their own frames, or cut, to the same number of
+    samples, a multiple of ``samples_per_gpu``. Set it as ``shuffler_sampler``.
+
+    Args:
+        dataset: Dataset used for sampling.
+        samples_per_gpu (int): Batch size, number of lanes. Default: 1.
+        num_replicas (optional): Number of processes participating in
+            distributed training.
+        rank (optional): Rank of the current process within num_replicas.
+        seed (int, optional): Random seed of the scene shuffle, identical
+            across all processes. Default: 0.
+        skip_first (int, optional): Number of frames without sampling at
+            the start of every scene. Default: None, ``dataset.queue_length``.
+    """
+
+    def __init__(self,
+                 dataset,
+                 samples_per_gpu=1,
+                 num_replicas=None,
+                 rank=None,
+                 seed=0,
+                 skip_first=None):
+        _rank, _num_replicas = get_dist_info()
+        if num_replicas is None:
+            num_replicas = _num_replicas
+        if rank is None:
+            rank = _rank
+        if skip_first is None:
+            skip_first = getattr(dataset, 'queue_length', 1)
+        self.dataset = dataset
+        self.samples_per_gpu = samples_per_gpu
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.epoch = 0
+        self.seed = seed if seed is not None else 0
+
+        self.scenes = [group[skip_first:] for group in scene_groups(dataset)]
+        self.scenes = [scene for scene in self.scenes if scene]
+        num_frames = sum(len(scene) for scene in self.scenes)
+        self.num_samples = int(math.ceil(
+            num_frames / self.samples_per_gpu / self.num_replicas)) * self.samples_per_gpu
+        self.total_size = self.num_samples * self.num_replicas
+
+    @staticmethod
+    def deal_scenes(scenes, num_replicas):
+        """Give every scene, in order, to the rank with the fewest frames so far."""
+        loads = np.zeros(num_replicas, dtype=np.int64)
+        dealt = [[] for _ in range(num_replicas)]
+        for scene in scenes:
+            r = int(np.argmin(loads))
+            dealt[r].append(scene)
+            loads[r] += len(scene)
+        return dealt
+
+    def __iter__(self):
+        # deterministically shuffle the scenes based on epoch
+        g = torch.Generator()
+        g.manual_seed(self.epoch + self.seed)
+        order = torch.randperm(len(self.scenes), generator=g).tolist()
+        scenes = self.deal_scenes([self.scenes[i] for i in order], self.num_replicas)[self.rank]
+
+        indices = SceneInterleavedSampler.interleave(scenes, self.samples_per_gpu)
+        # pad with the first frames of the rank, or cut the last ones
+        indices = (indices * int(math.ceil(self.num_samples / max(len(indices), 1))))[:self.num_samples]
+        assert len(indices) == self.num_samples
+        return iter(indices)
+
+    def __len__(self):
+        return self.num_samples
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+import torch
+
+from projects.mmdet3d_plugin.core.bbox.assigners.hungarian_assigner_3d import (
+    HungarianAssigner3D, auction_assignment)
+from projects.mmdet3d_plugin.core.bbox.util import normalize_bbox
+
+linear_sum_assignment = pytest.importorskip(
+    'scipy.optimize').linear_sum_assignment
+
+point_cloud_range = [-51.2, -51.2, -5.0, 51.2, 51.2, 3.0]
+
+
+def _assigner(solver='scipy'):
+    return HungarianAssigner3D(
+        cls_cost=dict(type='FocalLossCost', weight=2.0),
+        reg_cost=dict(type='BBox3DL1Cost', weight=0.25),
+        iou_cost=dict(type='IoUCost', weight=0.0),
+        pc_range=point_cloud_range,
+        solver=solver)
+
+
+def _random_batch(rng, num_gts, num_query=50, num_classes=10):
+    bbox_preds = torch.from_numpy(
+        rng.randn(len(num_gts), num_query, 10).astype(np.float32))
+    cls_preds = torch.from_numpy(
+        rng.randn(len(num_gts), num_query, num_classes).astype(np.float32))
+    gt_bboxes_list, gt_labels_list = [], []
+    for num_gt in num_gts:
+        gt_bboxes = rng.randn(num_gt, 9).astype(np.float32)
+        gt_bboxes[:, 3:6] = rng.uniform(0.5, 5, (num_gt, 3))
+        gt_bboxes_list.append(torch.from_numpy(gt_bboxes))
+        gt_labels_list.append(
+            torch.from_numpy(rng.randint(0, num_classes, num_gt)))
+    return bbox_preds, cls_preds, gt_bboxes_list, gt_labels_list
+
+
+def _total_cost(cost, rows):
+    return cost[rows, np.arange(len(rows))].sum()
+
+
+def test_auction_assignment():
+    rng = np.random.RandomState(0)
+    num_gts = [7, 30, 0, 1, 50]
+    # integer costs, a matching within num_gt * eps = 1e-3 * cost range of
+    # the optimum is optimal
+    cost = torch.from_numpy(
+        rng.randint(0, 100, (len(num_gts), 50, 50)).astype(np.float32))
+    assigned, finished = auction_assignment(cost, num_gts)
+    assert assigned.shape == (len(num_gts), 50)
+    assert finished.all()
+    for i, num_gt in enumerate(num_gts):
+        assert (assigned[i, num_gt:] == -1).all()
+        rows = assigned[i, :num_gt].numpy()
+        assert len(set(rows.tolist())) == num_gt
+        block = cost[i, :, :num_gt].numpy()
+        row_inds, col_inds = linear_sum_assignment(block)
+        assert _total_cost(block, rows) == block[row_inds, col_inds].sum()
+
+    # continuous costs have a single optimal matching, found with a small
+    # enough bid increment
+    cost = torch.from_numpy(rng.uniform(0, 1, (2, 50, 30)))
+    assigned, finished = auction_assignment(
+        cost, [30, 12], rel_eps=1e-9, max_iter=10000)
+    assert finished.all()
+    for i, num_gt in enumerate([30, 12]):
+        row_inds, col_inds = linear_sum_assignment(cost[i, :, :num_gt].numpy())
+        assert (assigned[i].numpy()[col_inds] == row_inds).all()
+
+    # a single matrix, and an auction stopped too early is reported
+    rows, done = auction_assignment(cost[0])
+    assert done and rows.shape == (30, )
+    _, done = auction_assignment(cost[0], max_iter=1)
+    assert not done
+
+
+def test_assign_batch():
+    rng = np.random.RandomState(1)
+    num_gts = [5, 0, 23, 50, 60]
+    bbox_preds, cls_preds, gt_bboxes_list, gt_labels_list = _random_batch(
+        rng, num_gts)
+
+    assigner = _assigner()
+    results = assigner.assign_batch(bbox_preds, cls_preds, gt_bboxes_list,
+                                    gt_labels_list)
+    for i, result in enumerate(results):
+        expected = assigner.assign(bbox_preds[i], cls_preds[i],
+                                   gt_bboxes_list[i], gt_labels_list[i])
+        assert result.num_gts == expected.num_gts
+        assert torch.equal(result.gt_inds, expected.gt_inds)
+        assert torch.equal(result.labels, expected.labels)
+
+    # the auction matches at the optimal cost up to its tolerance, the sample
+    # with more gts than queries is solved with scipy
+    auction = _assigner('auction')
+    auction_results = auction.assign_batch(bbox_preds, cls_preds,
+                                           gt_bboxes_list, gt_labels_list)
+    for i, (result, expected) in enumerate(zip(auction_results, results)):
+        if num_gts[i] == 0:
+            assert (result.gt_inds == 0).all()
+            continue
+        normalized_gt_bboxes = normalize_bbox(gt_bboxes_list[i],
+                                              point_cloud_range)
+        cost = (auction.cls_cost(cls_preds[i], gt_labels_list[i]) +
+                auction.reg_cost(bbox_preds[i][:, :8],
+                                 normalized_gt_bboxes[:, :8])).numpy()
+        assert (result.gt_inds > 0).sum() == (expected.gt_inds > 0).sum()
+
+        def total(gt_inds):
+            rows = torch.nonzero(gt_inds > 0).squeeze(1)
+            return cost[rows.numpy(), (gt_inds[rows] - 1).numpy()].sum()
+
+        tolerance = 1e-3 * (cost.max() - cost.min()) + 1e-4
+        assert total(result.gt_inds) <= total(expected.gt_inds) + tolerance
+        pos = result.gt_inds > 0
+        assert torch.equal(result.labels[pos],
+                           gt_labels_list[i][result.gt_inds[pos] - 1])
@@ -0,0 +1,28 @@
+import argparse
+import sys
+sys.path.append('.')
+
+from projects.mmdet3d_plugin.datasets.caption_token_store import CaptionTokenStore
+
+
+parser = argparse.ArgumentParser(description='Pre-tokenize the caption annotations')
+parser.add_argument(
+    '--caption-anno',
+    type=str,
+    default='data/nuscenes/final_caption_bbox_token.json',
+    help='caption json keyed by box token')
+parser.add_argument(
+    '--tokenizer',
+    type=str,
+    default='LLaMA-7B/tokenizer.model',
+    help='SentencePiece model of LLaMA')
+parser.add_argument(
+    '--out-dir',
+    type=str,
+    default='data/nuscenes/caption_tokens',
+    help='output directory of the caption token store')
+args = parser.parse_args()
+
+if __name__ == '__main__':
+    store = CaptionTokenStore.build(args.caption_anno, args.tokenizer, args.out_dir)
+    print(f'tokenized {len(store)} captions into {args.out_dir}')
@@ -0,0 +1,23 @@
+import argparse
+import sys
+sys.path.append('.')
+
+import mmcv
+
+from projects.mmdet3d_plugin.datasets.columnar_infos import ColumnarInfos
+
+
+parser = argparse.ArgumentParser(description='Export the infos of a pkl to a columnar, memory-mapped layout')
+parser.add_argument('info_path', help='*_infos_temporal_*.pkl of create_data.py')
+parser.add_argument(
+    '--out-dir',
+    type=str,
+    default=None,
+    help='output directory, defaults to the pkl path without extension')
+args = parser.parse_args()
+
+if __name__ == '__main__':
+    out_dir = args.out_dir or args.info_path.rsplit('.', 1)[0]
+    data = mmcv.load(args.info_path)
+    infos = ColumnarInfos.export(data['infos'], out_dir, data['metadata'])
+    print(f'exported {len(infos)} infos into {out_dir}')
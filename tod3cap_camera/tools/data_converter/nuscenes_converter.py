@@ -32,7 +32,8 @@ def create_nuscenes_infos(root_path,
                           can_bus_root_path,
                           info_prefix,
                           version='v1.0-trainval',
-                          max_sweeps=10):
+                          max_sweeps=10,
+                          workers=0):
     """Create info file of nuscene dataset.
 
     Given the raw data, generate its related info file in pkl format.
@@ -44,6 +45,11 @@ def create_nuscenes_infos(root_path,
             Default: 'v1.0-trainval'
         max_sweeps (int): Max number of sweeps.
             Default: 10
+        workers (int): Number of processes generating the infos scene by
+            scene, with per-scene files kept in
+            ``{out_path}/{info_prefix}_{version}_shards`` to resume an
+            interrupted run of the same settings. 0 runs the sequential loop.
+            Default: 0
     """
     from nuscenes.nuscenes import NuScenes
     from nuscenes.can_bus.can_bus_api import NuScenesCanBus
@@ -87,8 +93,14 @@ def create_nuscenes_infos(root_path,
         print('train scene: {}, val scene: {}'.format(
             len(train_scenes), len(val_scenes)))
 
-    train_nusc_infos, val_nusc_infos = _fill_trainval_infos(
-        nusc, nusc_can_bus, train_scenes, val_scenes, test, max_sweeps=max_sweeps)
+    if workers > 0:
+        shard_dir = osp.join(out_path, f'{info_prefix}_{version}_shards')
+        train_nusc_infos, val_nusc_infos = _fill_trainval_infos_sharded(
+            nusc, nusc_can_bus, train_scenes, val_scenes, shard_dir, test,
+            max_sweeps=max_sweeps, workers=workers)
+    else:
+        train_nusc_infos, val_nusc_infos = _fill_trainval_infos(
+            nusc, nusc_can_bus, train_scenes, val_scenes, test, max_sweeps=max_sweeps)
 
     metadata = dict(version=version)
     if test:
@@ -203,122 +215,13 @@ def _fill_trainval_infos(nusc,
     val_nusc_infos = []
     frame_idx = 0
     for sample in mmcv.track_iter_progress(nusc.sample):
-        lidar_token = sample['data']['LIDAR_TOP']
-        sd_rec = nusc.get('sample_data', sample['data']['LIDAR_TOP'])
-        cs_record = nusc.get('calibrated_sensor',
-                             sd_rec['calibrated_sensor_token'])
-        pose_record = nusc.get('ego_pose', sd_rec['ego_pose_token'])
-        lidar_path, boxes, _ = nusc.get_sample_data(lidar_token)
-
-        mmcv.check_file_exist(lidar_path)
-        can_bus = _get_can_bus_info(nusc, nusc_can_bus, sample)
-        ##
-        info = {
-            'lidar_path': lidar_path,
-            'token': sample['token'],
-            'prev': sample['prev'],
-            'next': sample['next'],
-            'can_bus': can_bus,
-            'frame_idx': frame_idx,  # temporal related info
-            'sweeps': [],
-            'cams': dict(),
-            'scene_token': sample['scene_token'],  # temporal related info
-            'lidar2ego_translation': cs_record['translation'],
-            'lidar2ego_rotation': cs_record['rotation'],
-            'ego2global_translation': pose_record['translation'],
-            'ego2global_rotation': pose_record['rotation'],
-            'timestamp': sample['timestamp'],
-        }
+        info = _fill_sample_info(nusc, nusc_can_bus, sample, frame_idx, test, max_sweeps)
 
         if sample['next'] == '':
             frame_idx = 0
         else:
             frame_idx += 1
 
-        l2e_r = info['lidar2ego_rotation']
-        l2e_t = info['lidar2ego_translation']
-        e2g_r = info['ego2global_rotation']
-        e2g_t = info['ego2global_translation']
-        l2e_r_mat = Quaternion(l2e_r).rotation_matrix
-        e2g_r_mat = Quaternion(e2g_r).rotation_matrix
-
-        # obtain 6 image's information per frame
-        camera_types = [
-            'CAM_FRONT',
-            'CAM_FRONT_RIGHT',
-            'CAM_FRONT_LEFT',
-            'CAM_BACK',
-            'CAM_BACK_LEFT',
-            'CAM_BACK_RIGHT',
-        ]
-        for cam in camera_types:
-            cam_token = sample['data'][cam]
-            cam_path, _, cam_intrinsic = nusc.get_sample_data(cam_token)
-            cam_info = obtain_sensor2top(nusc, cam_token, l2e_t, l2e_r_mat,
-                                         e2g_t, e2g_r_mat, cam)
-            cam_info.update(cam_intrinsic=cam_intrinsic)
-            info['cams'].update({cam: cam_info})
-
-        # obtain sweeps for a single key-frame
-        sd_rec = nusc.get('sample_data', sample['data']['LIDAR_TOP'])
-        sweeps = []
-        while len(sweeps) < max_sweeps:
-            if not sd_rec['prev'] == '':
-                sweep = obtain_sensor2top(nusc, sd_rec['prev'], l2e_t,
-                                          l2e_r_mat, e2g_t, e2g_r_mat, 'lidar')
-                sweeps.append(sweep)
-                sd_rec = nusc.get('sample_data', sd_rec['prev'])
-            else:
-                break
-        info['sweeps'] = sweeps
-        # obtain annotation
-        if not test:
-            annotations = [
-                nusc.get('sample_annotation', token)
-                for token in sample['anns']
-            ]
-            locs = np.array([b.center for b in boxes]).reshape(-1, 3)
-            dims = np.array([b.wlh for b in boxes]).reshape(-1, 3)
-            rots = np.array([b.orientation.yaw_pitch_roll[0]
-                             for b in boxes]).reshape(-1, 1)
-            velocity = np.array(
-                [nusc.box_velocity(token)[:2] for token in sample['anns']])
-            valid_flag = np.array(
-                [(anno['num_lidar_pts'] + anno['num_radar_pts']) > 0
-                 for anno in annotations],
-                dtype=bool).reshape(-1)
-            # convert velo from global to lidar
-            for i in range(len(boxes)):
-                velo = np.array([*velocity[i], 0.0])
-                velo = velo @ np.linalg.inv(e2g_r_mat).T @ np.linalg.inv(
-                    l2e_r_mat).T
-                velocity[i] = velo[:2]
-
-            names = [b.name for b in boxes]
-            for i in range(len(names)):
-                if names[i] in NuScenesDataset.NameMapping:
-                    names[i] = NuScenesDataset.NameMapping[names[i]]
-            names = np.array(names)
-
-            gt_captions = []
-            for b in boxes:
-                gt_captions.append(b.token)
-
-
-            # we need to convert rot to SECOND format.
-            gt_boxes = np.concatenate([locs, dims, -rots - np.pi / 2], axis=1)
-            assert len(gt_boxes) == len(
-                annotations), f'{len(gt_boxes)}, {len(annotations)}'
-            info['gt_boxes'] = gt_boxes
-            info['gt_captions'] = gt_captions
-            info['gt_names'] = names
-            info['gt_velocity'] = velocity.reshape(-1, 2)
-            info['num_lidar_pts'] = np.array(
-                [a['num_lidar_pts'] for a in annotations])
-            info['num_radar_pts'] = np.array(
-                [a['num_radar_pts'] for a in annotations])
-            info['valid_flag'] = valid_flag
-
         if sample['scene_token'] in train_scenes:
             train_nusc_infos.append(info)
         else:
@@ -327,6 +230,225 @@ def _fill_trainval_infos(nusc,
     return train_nusc_infos, val_nusc_infos
 
 
+def _fill_sample_info(nusc, nusc_can_bus, sample, frame_idx, test=False, max_sweeps=10):
+    """Generate the info of one sample, see `_fill_trainval_infos`."""
+    lidar_token = sample['data']['LIDAR_TOP']
+    sd_rec = nusc.get('sample_data', sample['data']['LIDAR_TOP'])
+    cs_record = nusc.get('calibrated_sensor',
+                         sd_rec['calibrated_sensor_token'])
+    pose_record = nusc.get('ego_pose', sd_rec['ego_pose_token'])
+    lidar_path, boxes, _ = nusc.get_sample_data(lidar_token)
+
+    mmcv.check_file_exist(lidar_path)
+    can_bus = _get_can_bus_info(nusc, nusc_can_bus, sample)
+    ##
+    info = {
+        'lidar_path': lidar_path,
+        'token': sample['token'],
+        'prev': sample['prev'],
+        'next': sample['next'],
+        'can_bus': can_bus,
+        'frame_idx': frame_idx,  # temporal related info
+        'sweeps': [],
+        'cams': dict(),
+        'scene_token': sample['scene_token'],  # temporal related info
+        'lidar2ego_translation': cs_record['translation'],
+        'lidar2ego_rotation': cs_record['rotation'],
+        'ego2global_translation': pose_record['translation'],
+        'ego2global_rotation': pose_record['rotation'],
+        'timestamp': sample['timestamp'],
+    }
+
+    l2e_r = info['lidar2ego_rotation']
+    l2e_t = info['lidar2ego_translation']
+    e2g_r = info['ego2global_rotation']
+    e2g_t = info['ego2global_translation']
+    l2e_r_mat = Quaternion(l2e_r).rotation_matrix
+    e2g_r_mat = Quaternion(e2g_r).rotation_matrix
+
+    # obtain 6 image's information per frame
+    camera_types = [
+        'CAM_FRONT',
+        'CAM_FRONT_RIGHT',
+        'CAM_FRONT_LEFT',
+        'CAM_BACK',
+        'CAM_BACK_LEFT',
+        'CAM_BACK_RIGHT',
+    ]
+    for cam in camera_types:
+        cam_token = sample['data'][cam]
+        cam_path, _, cam_intrinsic = nusc.get_sample_data(cam_token)
+        cam_info = obtain_sensor2top(nusc, cam_token, l2e_t, l2e_r_mat,
+                                     e2g_t, e2g_r_mat, cam)
+        cam_info.update(cam_intrinsic=cam_intrinsic)
+        info['cams'].update({cam: cam_info})
+
+    # obtain sweeps for a single key-frame
+    sd_rec = nusc.get('sample_data', sample['data']['LIDAR_TOP'])
+    sweeps = []
+    while len(sweeps) < max_sweeps:
+        if not sd_rec['prev'] == '':
+            sweep = obtain_sensor2top(nusc, sd_rec['prev'], l2e_t,
+                                      l2e_r_mat, e2g_t, e2g_r_mat, 'lidar')
+            sweeps.append(sweep)
+            sd_rec = nusc.get('sample_data', sd_rec['prev'])
+        else:
+            break
+    info['sweeps'] = sweeps
+    # obtain annotation
+    if not test:
+        annotations = [
+            nusc.get('sample_annotation', token)
+            for token in sample['anns']
+        ]
+        locs = np.array([b.center for b in boxes]).reshape(-1, 3)
+        dims = np.array([b.wlh for b in boxes]).reshape(-1, 3)
+        rots = np.array([b.orientation.yaw_pitch_roll[0]
+                         for b in boxes]).reshape(-1, 1)
+        velocity = np.array(
+            [nusc.box_velocity(token)[:2] for token in sample['anns']])
+        valid_flag = np.array(
+            [(anno['num_lidar_pts'] + anno['num_radar_pts']) > 0
+             for anno in annotations],
+            dtype=bool).reshape(-1)
+        # convert velo from global to lidar
+        for i in range(len(boxes)):
+            velo = np.array([*velocity[i], 0.0])
+            velo = velo @ np.linalg.inv(e2g_r_mat).T @ np.linalg.inv(
+                l2e_r_mat).T
+            velocity[i] = velo[:2]
+
+        names = [b.name for b in boxes]
+        for i in range(len(names)):
+            if names[i] in NuScenesDataset.NameMapping:
+                names[i] = NuScenesDataset.NameMapping[names[i]]
+        names = np.array(names)
+
+        gt_captions = []
+        for b in boxes:
+            gt_captions.append(b.token)
+
+
+        # we need to convert rot to SECOND format.
+        gt_boxes = np.concatenate([locs, dims, -rots - np.pi / 2], axis=1)
+        assert len(gt_boxes) == len(
+            annotations), f'{len(gt_boxes)}, {len(annotations)}'
+        info['gt_boxes'] = gt_boxes
+        info['gt_captions'] = gt_captions
+        info['gt_names'] = names
+        info['gt_velocity'] = velocity.reshape(-1, 2)
+        info['num_lidar_pts'] = np.array(
+            [a['num_lidar_pts'] for a in annotations])
+        info['num_radar_pts'] = np.array(
+            [a['num_radar_pts'] for a in annotations])
+        info['valid_flag'] = valid_flag
+    return info
+
+
+# set in the parent before the pool forks, shared copy-on-write by the workers
+_shard_nusc = None
+_shard_nusc_can_bus = None
+
+
+def _fill_scene_infos(scene_token, shard_dir, test=False, max_sweeps=10):
+    """Generate the infos of the samples of one scene into ``shard_dir``.
+
+    Returns the path of the per-scene info file, which holds the infos in
+    scene order and the position of each sample in ``nusc.sample``. Existing
+    files are kept, so an interrupted run resumes where it stopped.
+    """
+    shard_path = osp.join(shard_dir, f'{scene_token}.pkl')
+    if osp.exists(shard_path):
+        return shard_path
+    nusc, nusc_can_bus = _shard_nusc, _shard_nusc_can_bus
+    scene = nusc.get('scene', scene_token)
+    sample_token = scene['first_sample_token']
+    infos, positions = [], []
+    frame_idx = 0
+    while sample_token != '':
+        sample = nusc.get('sample', sample_token)
+        infos.append(_fill_sample_info(nusc, nusc_can_bus, sample, frame_idx, test, max_sweeps))
+        positions.append(nusc.getind('sample', sample_token))
+        frame_idx += 1
+        sample_token = sample['next']
+    # write to a temporary file first so a killed worker leaves no partial shard
+    mmcv.dump(dict(infos=infos, positions=positions), shard_path + '.tmp', file_format='pkl')
+    os.replace(shard_path + '.tmp', shard_path)
+    return shard_path
+
+
+def _fill_trainval_infos_sharded(nusc,
+                                 nusc_can_bus,
+                                 train_scenes,
+                                 val_scenes,
+                                 shard_dir,
+                                 test=False,
+                                 max_sweeps=10,
+                                 workers=4):
+    """Parallel and resumable `_fill_trainval_infos`.
+
+    The scenes are processed by a pool of ``workers`` processes, each writing
+    one info file per scene into ``shard_dir`` and skipping the scenes whose
+    file already exists. ``shard_dir/meta.json`` records the dataset roots,
+    version, ``test`` and ``max_sweeps`` the shards were generated with; the
+    shards of other settings are removed instead of being reused. The shards
+    are merged back in the order of ``nusc.sample``, so the result is the
+    same as `_fill_trainval_infos` whatever the number of workers or the
+    resumed scenes.
+
+    Args:
+        shard_dir (str): Directory of the per-scene info files.
+        workers (int): Number of processes. Default: 4.
+        Others are the same as `_fill_trainval_infos`.
+
+    Returns:
+        tuple[list[dict]]: Information of training set and validation set
+            that will be saved to the info file.
+    """
+    import glob
+    import multiprocessing
+    from functools import partial
+
+    global _shard_nusc, _shard_nusc_can_bus
+    _shard_nusc, _shard_nusc_can_bus = nusc, nusc_can_bus
+    mmcv.mkdir_or_exist(shard_dir)
+
+    meta = dict(
+        version=nusc.version,
+        dataroot=osp.abspath(nusc.dataroot),
+        can_bus_root=osp.abspath(nusc_can_bus.can_dir),
+        test=test,
+        max_sweeps=max_sweeps)
+    meta_path = osp.join(shard_dir, 'meta.json')
+    if not osp.exists(meta_path) or mmcv.load(meta_path) != meta:
+        for shard_path in glob.glob(osp.join(shard_dir, '*.pkl')):
+            os.remove(shard_path)
+        mmcv.dump(meta, meta_path)
+
+    # as in `_fill_trainval_infos`, scenes outside the train split go to val
+    scene_tokens = [scene['token'] for scene in nusc.scene]
+    fill = partial(_fill_scene_infos, shard_dir=shard_dir, test=test, max_sweeps=max_sweeps)
+    if workers > 1:
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            shard_paths = list(mmcv.track_iter_progress(
+                (pool.imap(fill, scene_tokens), len(scene_tokens))))
+    else:
+        shard_paths = [fill(token) for token in mmcv.track_iter_progress(scene_tokens)]
+
+    train_nusc_infos = []
+    val_nusc_infos = []
+    for scene_token, shard_path in zip(scene_tokens, shard_paths):
+        shard = mmcv.load(shard_path)
+        pairs = list(zip(shard['positions'], shard['infos']))
+        if scene_token in train_scenes:
+            train_nusc_infos.extend(pairs)
+        else:
+            val_nusc_infos.extend(pairs)
+    train_nusc_infos = [info for _, info in sorted(train_nusc_infos, key=lambda pair: pair[0])]
+    val_nusc_infos = [info for _, info in sorted(val_nusc_infos, key=lambda pair: pair[0])]
+    return train_nusc_infos, val_nusc_infos
+
+
 def obtain_sensor2top(nusc,
                       sensor_token,
                       l2e_t,
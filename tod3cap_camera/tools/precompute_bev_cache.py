@@ -0,0 +1,117 @@
+import argparse
+import copy
+import os
+
+import mmcv
+import torch
+import torch.distributed as dist
+from mmcv import Config, DictAction
+from mmcv.parallel import scatter
+from mmcv.runner import get_dist_info, init_dist, load_checkpoint
+
+from mmdet3d.datasets import build_dataset
+from mmdet3d.models import build_model
+from projects.mmdet3d_plugin.datasets.builder import build_dataloader
+from projects.mmdet3d_plugin.datasets.bev_feature_store import BEVFeatureStore
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Precompute the frozen BEVFormer outputs for stage-3 caption training')
+    parser.add_argument('config', help='stage-3 config file path')
+    parser.add_argument('checkpoint', help='checkpoint of the frozen encoder and detection head')
+    parser.add_argument('cache_root', help='directory of the BEV feature store')
+    parser.add_argument(
+        '--cfg-options',
+        nargs='+',
+        action=DictAction,
+        help='override some settings in the used config, the key-value pair '
+        'in xxx=yyy format will be merged into config file.')
+    parser.add_argument(
+        '--launcher',
+        choices=['none', 'pytorch', 'slurm', 'mpi'],
+        default='none',
+        help='job launcher')
+    parser.add_argument('--local_rank', type=int, default=0)
+    args = parser.parse_args()
+    if 'LOCAL_RANK' not in os.environ:
+        os.environ['LOCAL_RANK'] = str(args.local_rank)
+    return args
+
+
+def main():
+    args = parse_args()
+
+    cfg = Config.fromfile(args.config)
+    if args.cfg_options is not None:
+        cfg.merge_from_dict(args.cfg_options)
+
+    # import modules from plguin/xx, registry will be updated
+    if hasattr(cfg, 'plugin'):
+        if cfg.plugin:
+            import importlib
+            plugin_dir = cfg.plugin_dir if hasattr(cfg, 'plugin_dir') else args.config
+            _module_dir = os.path.dirname(plugin_dir)
+            _module_dir = _module_dir.split('/')
+            _module_path = _module_dir[0]
+            for m in _module_dir[1:]:
+                _module_path = _module_path + '.' + m
+            print(_module_path)
+            plg_lib = importlib.import_module(_module_path)
+
+    if args.launcher == 'none':
+        distributed = False
+    else:
+        distributed = True
+        init_dist(args.launcher, **cfg.dist_params)
+    rank, world_size = get_dist_info()
+
+    # the cached outputs are reused every epoch, so they are computed from the
+    # training samples without random photometric augmentation
+    train_cfg = copy.deepcopy(cfg.data.train)
+    train_cfg.pop('bev_cache_root', None)
+    train_cfg.pop('bev_cache_pipeline', None)
+    train_cfg.pipeline = [
+        t for t in train_cfg.pipeline if t['type'] != 'PhotoMetricDistortionMultiViewImage']
+    dataset = build_dataset(train_cfg)
+    data_loader = build_dataloader(
+        dataset,
+        samples_per_gpu=cfg.data.samples_per_gpu,
+        workers_per_gpu=cfg.data.workers_per_gpu,
+        dist=distributed,
+        shuffle=False,
+        nonshuffler_sampler=cfg.data.nonshuffler_sampler,
+    )
+
+    cfg.model.pretrained = None
+    model = build_model(cfg.model, train_cfg=cfg.get('train_cfg'), test_cfg=cfg.get('test_cfg'))
+    load_checkpoint(model, args.checkpoint, map_location='cpu')
+    model = model.cuda()
+    model.eval()
+
+    head = model.pts_bbox_head
+    if rank == 0:
+        BEVFeatureStore.create(
+            args.cache_root,
+            [info['token'] for info in dataset.data_infos],
+            bev_shape=(head.bev_h * head.bev_w, head.embed_dims),
+            bbox_shape=(head.num_query, head.code_size))
+    if distributed:
+        dist.barrier()
+    store = BEVFeatureStore(args.cache_root, mode='r+')
+
+    if rank == 0:
+        prog_bar = mmcv.ProgressBar(len(data_loader))
+    for data in data_loader:
+        data = scatter(data, [torch.cuda.current_device()])[0]
+        for result in model.precompute_bev_cache(**data):
+            store.write(**result)
+        if rank == 0:
+            prog_bar.update()
+    store.flush()
+    if distributed:
+        dist.barrier()
+
+
+if __name__ == '__main__':
+    main()